@@ -0,0 +1,142 @@
+"""
+Shared Transports for Azure SDK and OpenAI Clients
+One requests connection pool per process for sync clients, one aiohttp
+connection pool per event loop for async clients, and one httpx pool per
+process for the OpenAI SDK
+"""
+
+import asyncio
+import importlib.util
+import weakref
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable
+
+import httpx
+from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+
+
+_loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_SESSION_KEY = "aiohttp_session"
+
+# HTTP/2 multiplexing needs the optional h2 package (httpx[http2])
+LLM_HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+LLM_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+LLM_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+
+
+@lru_cache(maxsize=1)
+def _get_shared_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=100)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_shared_sync_transport() -> RequestsTransport:
+    """
+    Return a RequestsTransport backed by the process-wide requests session
+    
+    The sync Search, Cosmos and Key Vault clients share one keep-alive pool
+    instead of each opening its own TCP/TLS connections. The session is not
+    owned by the transport, so closing one client leaves the pool open.
+    """
+    return RequestsTransport(session=_get_shared_session(), session_owner=False)
+
+
+@lru_cache(maxsize=1)
+def get_llm_http_client() -> httpx.Client:
+    """
+    Return the process-wide sync httpx client for OpenAI SDK clients
+    """
+    return httpx.Client(http2=LLM_HTTP2_ENABLED, timeout=LLM_TIMEOUT, limits=LLM_LIMITS)
+
+
+@lru_cache(maxsize=1)
+def get_llm_async_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide async httpx client for OpenAI SDK clients
+    
+    The chat and embeddings clients share its keep-alive pool, so classify,
+    generate and embedding calls reuse warm TLS connections instead of each
+    SDK client opening its own.
+    """
+    return httpx.AsyncClient(http2=LLM_HTTP2_ENABLED, timeout=LLM_TIMEOUT, limits=LLM_LIMITS)
+
+
+def _get_loop_state() -> Dict[Hashable, Any]:
+    return _loop_state.setdefault(asyncio.get_running_loop(), {})
+
+
+def get_shared_transport() -> AioHttpTransport:
+    """
+    Return an AioHttpTransport backed by the loop's shared aiohttp session
+    
+    Must be called from within a running event loop. The session is not
+    owned by the transport, so closing an individual client leaves the
+    pool open for the others.
+    """
+    import aiohttp
+    
+    state = _get_loop_state()
+    session = state.get(_SESSION_KEY)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60)
+        )
+        state[_SESSION_KEY] = session
+    
+    return AioHttpTransport(session=session, session_owner=False)
+
+
+def get_loop_client(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Return the async client registered under key for the running loop,
+    creating it with factory on first use
+    """
+    state = _get_loop_state()
+    client = state.get(key)
+    if client is None:
+        client = factory()
+        state[key] = client
+    return client
+
+
+async def close_async_clients() -> None:
+    """
+    Close all async clients and the shared session for the running loop
+    
+    The process-wide OpenAI SDK client is left open; it is held by the
+    cached agent's LLM clients and is closed with close_llm_async_http_client.
+    """
+    state = _loop_state.pop(asyncio.get_running_loop(), {})
+    session = state.pop(_SESSION_KEY, None)
+    
+    for client in state.values():
+        try:
+            # httpx.AsyncClient closes with aclose(); Azure SDK clients with close()
+            close = getattr(client, "aclose", None) or client.close
+            await close()
+        except Exception as e:
+            print(f"Error closing async client: {e}")
+    
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def close_llm_async_http_client() -> None:
+    """
+    Close the shared OpenAI SDK async client, if it was created
+    
+    Objects built with it keep the closed client, so callers must also drop
+    those (e.g. get_agent.cache_clear()) before the next request.
+    """
+    if get_llm_async_http_client.cache_info().currsize:
+        await get_llm_async_http_client().aclose()
+        get_llm_async_http_client.cache_clear()
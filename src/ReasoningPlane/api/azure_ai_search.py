@@ -3,9 +3,20 @@ Azure AI Search Integration for RAG Knowledge Base
 Handles vector embeddings storage and hybrid search (vector + keyword)
 """
 
+import asyncio
+import importlib.util
+import math
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Any, Optional
+import numpy as np
 from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
@@ -16,15 +27,327 @@ from azure.search.documents.indexes.models import (
     VectorSearch,
     HnswAlgorithmConfiguration,
     VectorSearchProfile,
+    ScalarQuantizationCompression,
+    RescoringOptions,
+    VectorSearchCompressionRescoreStorageMethod,
     SemanticConfiguration,
     SemanticPrioritizedFields,
     SemanticField,
     SemanticSearch
 )
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 import os
 
+from async_transport import get_loop_client, get_shared_sync_transport, get_shared_transport
+from circuit_breaker import CircuitBreaker
+
+
+QUERY_VECTOR_CACHE_SIZE = 1024
+SEARCH_RESULT_CACHE_SIZE = 256
+RERANK_CANDIDATE_MULTIPLIER = 10
+RESCORE_OVERSAMPLING = 10.0
+EMBEDDING_BATCH_SIZE = 64
+UPLOAD_BATCH_SIZE = 1000
+MAX_CONCURRENT_UPLOADS = 4
+# Fail fast while the service is down: after SEARCH_BREAKER_FAIL_MAX
+# consecutive errors, queries go straight to the fallback for
+# SEARCH_BREAKER_RESET_SECONDS. Each attempt is bounded by
+# SEARCH_TIMEOUT_SECONDS per connect/read with a single SDK retry.
+# Query embeddings have their own breaker: while OpenAI is failing, searches
+# run keyword-only rather than counting against the search service.
+SEARCH_BREAKER_FAIL_MAX = 5
+SEARCH_BREAKER_RESET_SECONDS = 30.0
+SEARCH_TIMEOUT_SECONDS = 2.0
+SEARCH_RETRY_TOTAL = 1
+MOCK_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+MOCK_KEYWORD_WEIGHT = 0.5
+
+_MOCK_KB = {
+    "IT": {
+        "DBA": (
+            {
+                "id": "kb-887",
+                "title": "Database Connection Troubleshooting",
+                "content": "Step-by-step guide to diagnose and resolve database connection timeouts...",
+                "department": "IT",
+                "team": "DBA",
+                "source": "Confluence",
+                "url": "https://confluence.company.com/kb-887",
+                "score": 0.95
+            },
+        ),
+        "Security": (
+            {
+                "id": "kb-234",
+                "title": "Zero-Trust Network Access Policy",
+                "content": "Corporate zero-trust security model and implementation guidelines...",
+                "department": "IT",
+                "team": "Security",
+                "source": "Confluence",
+                "url": "https://confluence.company.com/kb-234",
+                "score": 0.88
+            },
+        )
+    },
+    "HR": {
+        "Onboarding": (
+            {
+                "id": "hr-101",
+                "title": "New Hire Onboarding Checklist",
+                "content": "Complete onboarding process including background checks, equipment, and training...",
+                "department": "HR",
+                "team": "Onboarding",
+                "source": "SharePoint",
+                "url": "https://sharepoint.company.com/hr/hr-101",
+                "score": 0.92
+            },
+        )
+    }
+}
+
+_MOCK_KB_BY_SLICE = {
+    (department, team): docs
+    for department, teams in _MOCK_KB.items()
+    for team, docs in teams.items()
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class _BM25Index:
+    """
+    Minimal in-process BM25 (Okapi) scorer for the mock knowledge base
+    
+    Uses the non-negative Lucene IDF so terms present in most documents of
+    a small corpus still contribute a positive score.
+    """
+    
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(_tokenize(text)) for text in texts]
+        self.doc_lens = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_doc_len = (sum(self.doc_lens) / len(self.doc_lens)) if texts else 0.0
+        
+        doc_freqs = Counter(term for tf in self.term_freqs for term in tf)
+        n_docs = len(texts)
+        self.idf = {
+            term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+    
+    def get_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.term_freqs))
+        query_terms = [term for term in set(_tokenize(query)) if term in self.idf]
+        
+        for i, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / self.avg_doc_len)
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    scores[i] += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+
+class _LocalEmbedder:
+    """
+    Optional fastembed model that adds a semantic signal to mock search
+    
+    Only loaded when fastembed is installed; mock search is keyword-only
+    otherwise. Document vectors are computed once on first use.
+    """
+    
+    _instance: Optional["_LocalEmbedder"] = None
+    _load_failed = False
+    _lock = threading.Lock()
+    
+    def __init__(self, texts: List[str]):
+        from fastembed import TextEmbedding
+        
+        self.model = TextEmbedding(model_name=MOCK_EMBEDDING_MODEL)
+        self.doc_vectors = self._normalize(np.stack(list(self.model.embed(texts))))
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+    
+    @classmethod
+    def get(cls) -> Optional["_LocalEmbedder"]:
+        with cls._lock:
+            if cls._instance is None and not cls._load_failed:
+                if importlib.util.find_spec("fastembed") is None:
+                    cls._load_failed = True
+                    return None
+                try:
+                    cls._instance = cls(_MOCK_TEXTS)
+                except Exception as e:
+                    print(f"Warning: Local embedder unavailable, mock search is keyword-only: {e}")
+                    cls._load_failed = True
+            return cls._instance
+    
+    def similarities(self, query: str) -> np.ndarray:
+        query_vector = self._normalize(next(iter(self.model.embed([query]))))
+        return self.doc_vectors @ query_vector
+
+
+_MOCK_DOCS = [doc for docs in _MOCK_KB_BY_SLICE.values() for doc in docs]
+_MOCK_TEXTS = [f"{doc['title']} {doc['content']}" for doc in _MOCK_DOCS]
+_MOCK_BM25 = _BM25Index(_MOCK_TEXTS)
+
+
+def _odata_literal(value: str) -> str:
+    """Quote a value as an OData string literal, doubling embedded quotes"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+@lru_cache(maxsize=64)
+def _build_filter(department: Optional[str], team: Optional[str]) -> Optional[str]:
+    """
+    Build the department/team filter expression for hybrid search
+    
+    Memoized so repeated slices reuse one interned filter string.
+    """
+    if not department:
+        return None
+    
+    filter_expr = f"department eq {_odata_literal(department)}"
+    if team:
+        filter_expr += f" and team eq {_odata_literal(team)}"
+    return filter_expr
+
+
+def _quantize_fp16(vector: List[float]) -> List[float]:
+    """
+    Round an embedding to float16 precision to match the Half vector field
+    """
+    return np.asarray(vector, dtype=np.float16).tolist()
+
+
+class _LRUCache:
+    """Small thread-safe LRU cache backed by an OrderedDict"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+    
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+@lru_cache(maxsize=1)
+def _get_search_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool for parallel search calls, creating it on first use
+    """
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _is_throttled(error: BaseException) -> bool:
+    return isinstance(error, HttpResponseError) and error.status_code in (429, 503)
+
+
+@retry(
+    retry=retry_if_exception(_is_throttled),
+    wait=wait_exponential(multiplier=0.5, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+async def _upload_documents(search_client: AsyncSearchClient, documents: List[Dict[str, Any]]) -> list:
+    return await search_client.upload_documents(documents=documents)
+
+
+class _CrossEncoderReranker:
+    """
+    Local ONNX cross-encoder (bge-reranker-v2-m3) for second-stage reranking
+    
+    Loaded lazily as a process-wide singleton; onnxruntime and transformers
+    are only required when reranking is actually requested.
+    """
+    
+    _instance: Optional["_CrossEncoderReranker"] = None
+    _load_failed = False
+    _lock = threading.Lock()
+    
+    def __init__(self, model_path: str, tokenizer_name: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    @classmethod
+    def get(cls) -> Optional["_CrossEncoderReranker"]:
+        with cls._lock:
+            if cls._instance is None and not cls._load_failed:
+                try:
+                    cls._instance = cls(
+                        model_path=os.environ.get("RERANKER_MODEL_PATH", "bge-reranker-v2-m3.onnx"),
+                        tokenizer_name=os.environ.get("RERANKER_TOKENIZER", "BAAI/bge-reranker-v2-m3")
+                    )
+                except Exception as e:
+                    print(f"Warning: Reranker unavailable, skipping rerank stage: {e}")
+                    cls._load_failed = True
+            return cls._instance
+    
+    def rerank(
+        self,
+        query: str,
+        documents: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Score all (query, content) pairs in one batched session.run call
+        """
+        if not documents:
+            return documents
+        
+        encoded = self.tokenizer(
+            [query] * len(documents),
+            [doc.get("content") or "" for doc in documents],
+            padding="longest",
+            truncation=True,
+            max_length=512,
+            return_tensors="np"
+        )
+        inputs = {name: encoded[name] for name in self.input_names if name in encoded}
+        logits = self.session.run(None, inputs)[0].reshape(-1)
+        
+        return [
+            {**documents[i], "rerank_score": float(logits[i])}
+            for i in np.argsort(-logits)[:top_k]
+        ]
+
 
 class AzureAISearchManager:
     """
@@ -35,6 +358,12 @@ class AzureAISearchManager:
     - Hybrid search (vector + BM25 keyword)
     - Semantic ranking
     - Per-department index isolation
+    - Batched embeddings with parallel search fan-out
+    - In-process LRU caches for query embeddings and search results
+    - Async search client over a shared aiohttp connection pool
+    - Batched, pipelined document ingestion
+    - SDK clients and embeddings created lazily on first use
+    - Circuit breaker and short timeouts so outages fall back immediately
     """
     
     def __init__(
@@ -46,6 +375,18 @@ class AzureAISearchManager:
         self.endpoint = endpoint or os.environ.get("AZURE_SEARCH_ENDPOINT")
         self.api_key = api_key or os.environ.get("AZURE_SEARCH_API_KEY")
         self.index_name = index_name
+        self._query_vec_cache = _LRUCache(QUERY_VECTOR_CACHE_SIZE)
+        self._result_cache = _LRUCache(SEARCH_RESULT_CACHE_SIZE)
+        self._breaker = CircuitBreaker(
+            "azure-search",
+            fail_max=SEARCH_BREAKER_FAIL_MAX,
+            reset_timeout=SEARCH_BREAKER_RESET_SECONDS
+        )
+        self._embedding_breaker = CircuitBreaker(
+            "openai-embeddings",
+            fail_max=SEARCH_BREAKER_FAIL_MAX,
+            reset_timeout=SEARCH_BREAKER_RESET_SECONDS
+        )
         
         if not self.endpoint or not self.api_key:
             print("Warning: Azure AI Search not configured. Using mock retrieval.")
@@ -53,39 +394,58 @@ class AzureAISearchManager:
             return
         
         self.configured = True
-        self.credential = AzureKeyCredential(self.api_key)
-        self.index_client = SearchIndexClient(
+    
+    @cached_property
+    def credential(self) -> AzureKeyCredential:
+        return AzureKeyCredential(self.api_key)
+    
+    @cached_property
+    def index_client(self) -> SearchIndexClient:
+        return SearchIndexClient(
             endpoint=self.endpoint,
-            credential=self.credential
+            credential=self.credential,
+            transport=get_shared_sync_transport()
         )
-        self.search_client = SearchClient(
+    
+    @cached_property
+    def search_client(self) -> SearchClient:
+        return SearchClient(
             endpoint=self.endpoint,
             index_name=self.index_name,
-            credential=self.credential
+            credential=self.credential,
+            transport=get_shared_sync_transport()
         )
-        
+    
+    @cached_property
+    def embeddings(self) -> Optional[OpenAIEmbeddings]:
         azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
         azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY")
         openai_api_key = os.environ.get("OPENAI_API_KEY")
         
         if azure_endpoint and azure_api_key:
-            self.embeddings = AzureOpenAIEmbeddings(
+            return AzureOpenAIEmbeddings(
                 azure_deployment="text-embedding-3-small",
                 azure_endpoint=azure_endpoint,
                 api_key=azure_api_key,
                 api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
             )
         elif openai_api_key:
-            self.embeddings = OpenAIEmbeddings(
+            return OpenAIEmbeddings(
                 model="text-embedding-3-small",
                 api_key=openai_api_key
             )
-        else:
-            print("Warning: No OpenAI credentials for embeddings")
+        
+        print("Warning: No OpenAI credentials for embeddings")
+        return None
     
-    def create_index(self) -> None:
+    def create_index(self, enable_compression: bool = True) -> None:
         """
         Create or update Azure AI Search index with vector search capabilities
+        
+        Vectors are stored as float16 (half the memory of float32). With
+        enable_compression, HNSW runs over int8 scalar-quantized vectors and
+        the top k * 10 candidates are rescored against the preserved
+        full-precision originals, keeping recall close to uncompressed.
         """
         if not self.configured:
             print("Azure AI Search not configured. Skipping index creation.")
@@ -112,7 +472,7 @@ class AzureAISearchManager:
             ),
             SearchField(
                 name="content_vector",
-                type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                type=SearchFieldDataType.Collection(SearchFieldDataType.Half),
                 searchable=True,
                 vector_search_dimensions=1536,
                 vector_search_profile_name="my-vector-profile"
@@ -146,9 +506,9 @@ class AzureAISearchManager:
                 HnswAlgorithmConfiguration(
                     name="my-hnsw-config",
                     parameters={
-                        "m": 4,
-                        "efConstruction": 400,
-                        "efSearch": 500,
+                        "m": 16,
+                        "efConstruction": 200,
+                        "efSearch": 100,
                         "metric": "cosine"
                     }
                 )
@@ -156,9 +516,20 @@ class AzureAISearchManager:
             profiles=[
                 VectorSearchProfile(
                     name="my-vector-profile",
-                    algorithm_configuration_name="my-hnsw-config"
+                    algorithm_configuration_name="my-hnsw-config",
+                    compression_name="sq-8bit" if enable_compression else None
                 )
-            ]
+            ],
+            compressions=[
+                ScalarQuantizationCompression(
+                    compression_name="sq-8bit",
+                    rescoring_options=RescoringOptions(
+                        enable_rescoring=True,
+                        default_oversampling=RESCORE_OVERSAMPLING,
+                        rescore_storage_method=VectorSearchCompressionRescoreStorageMethod.PRESERVE_ORIGINALS
+                    )
+                )
+            ] if enable_compression else None
         )
         
         semantic_config = SemanticConfiguration(
@@ -186,66 +557,418 @@ class AzureAISearchManager:
         except Exception as e:
             print(f"Error creating index: {e}")
     
+    async def ingest(self, docs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Embed and upload knowledge base documents in batches
+        
+        Documents are embedded 64 per embeddings request and uploaded 1000
+        per index request. Uploads run in the background (up to 4 at once)
+        while the next batches are embedded, and are retried with backoff
+        when the service throttles.
+        
+        Args:
+            docs: Documents with id, title, content, department, team,
+                source and url fields
+        
+        Returns:
+            Number of documents successfully indexed
+        """
+        if not self.configured:
+            print("Azure AI Search not configured. Skipping ingestion.")
+            return 0
+        if self.embeddings is None:
+            print("Warning: No embeddings client. Skipping ingestion.")
+            return 0
+        
+        search_client = get_loop_client((self, "search"), self._create_async_search_client)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+        uploads = []
+        pending: List[Dict[str, Any]] = []
+        
+        for batch in _chunked(docs, EMBEDDING_BATCH_SIZE):
+            vectors = await self.embeddings.aembed_documents([doc["content"] for doc in batch])
+            pending.extend(
+                {**doc, "content_vector": _quantize_fp16(vector)}
+                for doc, vector in zip(batch, vectors)
+            )
+            while len(pending) >= UPLOAD_BATCH_SIZE:
+                uploads.append(asyncio.create_task(
+                    self._upload_batch(search_client, pending[:UPLOAD_BATCH_SIZE], semaphore)
+                ))
+                pending = pending[UPLOAD_BATCH_SIZE:]
+        
+        if pending:
+            uploads.append(asyncio.create_task(
+                self._upload_batch(search_client, pending, semaphore)
+            ))
+        
+        indexed = 0
+        for result in await asyncio.gather(*uploads, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Error uploading documents: {result}")
+            else:
+                indexed += result
+        
+        self.clear_cache()
+        print(f"Indexed {indexed} documents into '{self.index_name}'.")
+        return indexed
+    
+    async def _upload_batch(
+        self,
+        search_client: AsyncSearchClient,
+        documents: List[Dict[str, Any]],
+        semaphore: asyncio.Semaphore
+    ) -> int:
+        async with semaphore:
+            results = await _upload_documents(search_client, documents)
+        return sum(1 for result in results if result.succeeded)
+    
     def hybrid_search(
         self,
         query: str,
         department: Optional[str] = None,
         team: Optional[str] = None,
-        top_k: int = 5
+        top_k: int = 5,
+        exhaustive: bool = False,
+        enable_rerank: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Perform hybrid search (vector + keyword) with optional filtering
         
+        The index uses HNSW with m=16 / efSearch=100, which keeps recall high
+        while visiting far fewer graph nodes than a large efSearch. Azure AI
+        Search does not accept a per-query efSearch, so callers that need
+        exact recall can pass exhaustive=True to run brute-force kNN instead,
+        at a latency cost proportional to index size.
+        
         Args:
             query: Search query text
             department: Filter by department (IT, HR, Finance, Legal)
             team: Filter by team (DBA, Onboarding, etc.)
             top_k: Number of results to return
-            
+            exhaustive: Bypass HNSW and run exact kNN over all vectors
+            enable_rerank: Fetch top_k * 10 candidates and rerank them with
+                a local cross-encoder before truncating to top_k
+        
         Returns:
             List of search results with metadata
         """
         if not self.configured:
             return self._mock_search(query, department, team, top_k)
         
+        cache_key = (query, department, team, top_k, exhaustive, enable_rerank)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        query_vector = self._query_vector(query)
+        if not self._breaker.allow():
+            return self._mock_search(query, department, team, top_k)
+        
         try:
-            query_vector = self.embeddings.embed_query(query)
-            
-            filter_expr = None
-            if department:
-                filter_expr = f"department eq '{department}'"
-                if team:
-                    filter_expr += f" and team eq '{team}'"
-            
-            results = self.search_client.search(
-                search_text=query,
-                vector_queries=[{
-                    "kind": "vector",
-                    "vector": query_vector,
-                    "fields": "content_vector",
-                    "k": top_k
-                }],
-                filter=filter_expr,
-                top=top_k,
-                select=["id", "title", "content", "department", "team", "source", "url"]
+            candidates = top_k * RERANK_CANDIDATE_MULTIPLIER if enable_rerank else top_k
+            results = self._vector_search(
+                query, query_vector, department, team, candidates, exhaustive
             )
-            
-            return [
-                {
-                    "id": result["id"],
-                    "title": result["title"],
-                    "content": result["content"],
-                    "department": result.get("department"),
-                    "team": result.get("team"),
-                    "source": result.get("source"),
-                    "url": result.get("url"),
-                    "score": result["@search.score"]
-                }
-                for result in results
-            ]
+            if enable_rerank:
+                results = self._rerank(query, results, top_k)
         except Exception as e:
+            self._breaker.record_failure()
             print(f"Search error: {e}")
             return self._mock_search(query, department, team, top_k)
+        
+        self._breaker.record_success()
+        # Keyword-only results are not cached so the next query gets vectors
+        if query_vector is not None:
+            self._result_cache.put(cache_key, results)
+        return list(results)
+    
+    async def ahybrid_search(
+        self,
+        query: str,
+        department: Optional[str] = None,
+        team: Optional[str] = None,
+        top_k: int = 5,
+        exhaustive: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of hybrid_search using the aio SearchClient
+        
+        Shares the query embedding and result caches with hybrid_search.
+        """
+        if not self.configured:
+            return self._mock_search(query, department, team, top_k)
+        
+        cache_key = (query, department, team, top_k, exhaustive, False)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        query_vector = await self._aquery_vector(query)
+        if not self._breaker.allow():
+            return self._mock_search(query, department, team, top_k)
+        
+        try:
+            search_client = get_loop_client((self, "search"), self._create_async_search_client)
+            results = await search_client.search(
+                **self._search_kwargs(query, query_vector, department, team, top_k, exhaustive)
+            )
+            results = [self._format_result(result) async for result in results]
+        except Exception as e:
+            self._breaker.record_failure()
+            print(f"Search error: {e}")
+            return self._mock_search(query, department, team, top_k)
+        
+        self._breaker.record_success()
+        if query_vector is not None:
+            self._result_cache.put(cache_key, results)
+        return list(results)
+    
+    def hybrid_search_batch(
+        self,
+        queries: List[str],
+        department: Optional[str] = None,
+        team: Optional[str] = None,
+        top_k: int = 5,
+        exhaustive: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Perform hybrid search for several queries at once
+        
+        All query embeddings are generated in a single API request and the
+        search calls are issued in parallel on a shared thread pool.
+        
+        Args:
+            queries: Search query texts
+            department: Filter by department (IT, HR, Finance, Legal)
+            team: Filter by team (DBA, Onboarding, etc.)
+            top_k: Number of results to return per query
+            exhaustive: Bypass HNSW and run exact kNN over all vectors
+        
+        Returns:
+            One list of search results per query, in input order
+        """
+        if not self.configured:
+            return [self._mock_search(query, department, team, top_k) for query in queries]
+        
+        if not queries:
+            return []
+        
+        query_vectors = self._query_vectors(queries)
+        if not self._breaker.allow():
+            return [self._mock_search(query, department, team, top_k) for query in queries]
+        
+        futures = [
+            _get_search_executor().submit(
+                self._vector_search, query, vector, department, team, top_k, exhaustive
+            )
+            for query, vector in zip(queries, query_vectors)
+        ]
+        
+        results = []
+        failed = False
+        for query, future in zip(queries, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failed = True
+                print(f"Search error: {e}")
+                results.append(self._mock_search(query, department, team, top_k))
+        
+        if failed:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return results
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Generate the embedding for a search query, reusing cached vectors
+        """
+        query_vector = self._query_vec_cache.get(query)
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query(query)
+            self._query_vec_cache.put(query, query_vector)
+        return query_vector
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts in a single API request
+        """
+        return self.embeddings.embed_documents(texts)
+    
+    def clear_cache(self) -> None:
+        """
+        Drop cached query embeddings and search results (e.g. after re-indexing)
+        """
+        self._query_vec_cache.clear()
+        self._result_cache.clear()
+    
+    def _query_vector(self, query: str) -> Optional[List[float]]:
+        """
+        Query embedding for a search, or None to search keyword-only
+        
+        Embedding errors are recorded on the embeddings breaker, not the
+        search breaker, and an open embeddings breaker skips the call.
+        """
+        query_vector = self._query_vec_cache.get(query)
+        if query_vector is not None:
+            return query_vector
+        if self.embeddings is None or not self._embedding_breaker.allow():
+            return None
+        
+        try:
+            query_vector = self.embeddings.embed_query(query)
+        except Exception as e:
+            self._embedding_breaker.record_failure()
+            print(f"Embedding error: {e}")
+            return None
+        
+        self._embedding_breaker.record_success()
+        self._query_vec_cache.put(query, query_vector)
+        return query_vector
+    
+    async def _aquery_vector(self, query: str) -> Optional[List[float]]:
+        """
+        Async variant of _query_vector
+        """
+        query_vector = self._query_vec_cache.get(query)
+        if query_vector is not None:
+            return query_vector
+        if self.embeddings is None or not self._embedding_breaker.allow():
+            return None
+        
+        try:
+            query_vector = await self.embeddings.aembed_query(query)
+        except Exception as e:
+            self._embedding_breaker.record_failure()
+            print(f"Embedding error: {e}")
+            return None
+        
+        self._embedding_breaker.record_success()
+        self._query_vec_cache.put(query, query_vector)
+        return query_vector
+    
+    def _query_vectors(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """
+        Batched variant of _query_vector; every entry is None on failure
+        """
+        if self.embeddings is None or not self._embedding_breaker.allow():
+            return [self._query_vec_cache.get(query) for query in queries]
+        
+        try:
+            query_vectors = self._embed_queries(queries)
+        except Exception as e:
+            self._embedding_breaker.record_failure()
+            print(f"Embedding error: {e}")
+            return [self._query_vec_cache.get(query) for query in queries]
+        
+        self._embedding_breaker.record_success()
+        return query_vectors
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed search queries, batching only the cache misses into one request
+        """
+        vectors = [self._query_vec_cache.get(query) for query in queries]
+        misses = list(dict.fromkeys(
+            query for query, vector in zip(queries, vectors) if vector is None
+        ))
+        
+        if misses:
+            computed = dict(zip(misses, self.embed_documents(misses)))
+            for query, vector in computed.items():
+                self._query_vec_cache.put(query, vector)
+            vectors = [
+                vector if vector is not None else computed[query]
+                for query, vector in zip(queries, vectors)
+            ]
+        
+        return vectors
+    
+    def _rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank candidates with the cross-encoder, or truncate if unavailable
+        """
+        reranker = _CrossEncoderReranker.get()
+        if reranker is None:
+            return results[:top_k]
+        return reranker.rerank(query, results, top_k)
+    
+    def _vector_search(
+        self,
+        query: str,
+        query_vector: Optional[List[float]],
+        department: Optional[str],
+        team: Optional[str],
+        top_k: int,
+        exhaustive: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute a hybrid search request with a precomputed query vector
+        """
+        results = self.search_client.search(
+            **self._search_kwargs(query, query_vector, department, team, top_k, exhaustive)
+        )
+        return [self._format_result(result) for result in results]
+    
+    def _search_kwargs(
+        self,
+        query: str,
+        query_vector: Optional[List[float]],
+        department: Optional[str],
+        team: Optional[str],
+        top_k: int,
+        exhaustive: bool
+    ) -> Dict[str, Any]:
+        """
+        Build the SearchClient.search arguments shared by sync and async paths
+        
+        Without a query vector the request is keyword-only.
+        """
+        kwargs = {
+            "search_text": query,
+            "filter": _build_filter(department, team),
+            "top": top_k,
+            "select": ["id", "title", "content", "department", "team", "source", "url"],
+            "connection_timeout": SEARCH_TIMEOUT_SECONDS,
+            "read_timeout": SEARCH_TIMEOUT_SECONDS,
+            "retry_total": SEARCH_RETRY_TOTAL
+        }
+        if query_vector is not None:
+            kwargs["vector_queries"] = [{
+                "kind": "vector",
+                "vector": query_vector,
+                "fields": "content_vector",
+                "k": top_k,
+                "exhaustive": exhaustive
+            }]
+        return kwargs
+    
+    @staticmethod
+    def _format_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Normalize a search hit in place
+        
+        select= already limits the hit to the indexed fields (Azure returns
+        every selected key, null when unset), so only the score key needs
+        renaming; no per-hit dict is rebuilt.
+        """
+        result["score"] = result.pop("@search.score", 0.0)
+        return result
+    
+    def _create_async_search_client(self) -> AsyncSearchClient:
+        return AsyncSearchClient(
+            endpoint=self.endpoint,
+            index_name=self.index_name,
+            credential=self.credential,
+            transport=get_shared_transport()
+        )
     
     def _mock_search(
         self,
@@ -256,54 +979,46 @@ class AzureAISearchManager:
     ) -> List[Dict[str, Any]]:
         """
         Fallback mock search when Azure AI Search is not configured
+        
+        Ranks the mock corpus against the query with BM25, fused with local
+        embedding similarity when fastembed is installed, and applies the
+        same department/team filter as the real hybrid search.
         """
-        mock_kb = {
-            "IT": {
-                "DBA": [
-                    {
-                        "id": "kb-887",
-                        "title": "Database Connection Troubleshooting",
-                        "content": "Step-by-step guide to diagnose and resolve database connection timeouts...",
-                        "department": "IT",
-                        "team": "DBA",
-                        "source": "Confluence",
-                        "url": "https://confluence.company.com/kb-887",
-                        "score": 0.95
-                    }
-                ],
-                "Security": [
-                    {
-                        "id": "kb-234",
-                        "title": "Zero-Trust Network Access Policy",
-                        "content": "Corporate zero-trust security model and implementation guidelines...",
-                        "department": "IT",
-                        "team": "Security",
-                        "source": "Confluence",
-                        "url": "https://confluence.company.com/kb-234",
-                        "score": 0.88
-                    }
-                ]
-            },
-            "HR": {
-                "Onboarding": [
-                    {
-                        "id": "hr-101",
-                        "title": "New Hire Onboarding Checklist",
-                        "content": "Complete onboarding process including background checks, equipment, and training...",
-                        "department": "HR",
-                        "team": "Onboarding",
-                        "source": "SharePoint",
-                        "url": "https://sharepoint.company.com/hr/hr-101",
-                        "score": 0.92
-                    }
-                ]
-            }
-        }
+        scores = _MOCK_BM25.get_scores(query)
+        if scores.max() > 0:
+            scores = scores / scores.max()
         
-        dept_kb = mock_kb.get(department or "IT", {})
-        team_kb = dept_kb.get(team or "DBA", [])
+        embedder = _LocalEmbedder.get()
+        if embedder is not None:
+            scores = (
+                MOCK_KEYWORD_WEIGHT * scores
+                + (1 - MOCK_KEYWORD_WEIGHT) * embedder.similarities(query)
+            )
         
-        return team_kb[:top_k] if team_kb else []
+        results = []
+        for i in np.argsort(-scores, kind="stable"):
+            doc = _MOCK_DOCS[i]
+            if department and doc["department"] != department:
+                continue
+            if department and team and doc["team"] != team:
+                continue
+            results.append({**doc, "score": round(float(scores[i]), 4)})
+            if len(results) == top_k:
+                break
+        return results
+
+
+@lru_cache(maxsize=1)
+def get_search_manager() -> AzureAISearchManager:
+    """
+    Return the process-wide search manager, creating it on first use
+    """
+    return AzureAISearchManager()
 
 
-search_manager = AzureAISearchManager()
+def __getattr__(name: str) -> Any:
+    # Keeps `from azure_ai_search import search_manager` working without creating
+    # the manager at import time
+    if name == "search_manager":
+        return get_search_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,12 +3,159 @@ Azure Cosmos DB Integration for Immutable Decision Log Storage
 7-year retention policy for compliance and audit trail
 """
 
+import asyncio
 import os
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+import re
+import time
+import types
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import count, product
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from azure.core import MatchConditions
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
 import json
 
+from async_transport import get_loop_client, get_shared_sync_transport, get_shared_transport
+
+
+TRANSACTIONAL_BATCH_LIMIT = 100
+# Threads writing latest-decision pointers, which live in their own
+# ticket_id-partitioned container and cannot join a partition's batch
+LATEST_POINTER_WORKERS = 8
+# Pointer writes are conditional on the etag read just before, so a write
+# that loses a race re-reads and retries up to this many times
+LATEST_POINTER_MAX_ATTEMPTS = 5
+# Upper bound on in-flight async writes per event loop, to stay within RU budget
+MAX_CONCURRENT_WRITES = 32
+_SEVEN_YEAR_TTL_SECONDS = 2555 * 24 * 60 * 60
+
+# Disambiguates decision ids for the same ticket logged within one second
+_DECISION_SEQUENCE = count()
+
+_write_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# FROM/WHERE/ORDER BY clauses for each (department, start_date, end_date)
+# filter combination, so Cosmos sees a stable query text per combination
+_QUERY_TEMPLATES = {
+    (has_dept, has_start, has_end): "FROM c WHERE 1=1"
+    + (" AND c.department = @department" if has_dept else "")
+    + (" AND c.timestamp >= @start_date" if has_start else "")
+    + (" AND c.timestamp <= @end_date" if has_end else "")
+    + " ORDER BY c.timestamp DESC"
+    for has_dept, has_start, has_end in product((False, True), repeat=3)
+}
+
+# The latest-decision container is only ever point-read by id, so it is not
+# indexed; that keeps each pointer upsert to roughly the bare write charge
+_LATEST_DECISION_INDEXING_POLICY = {"indexingMode": "none", "automatic": False}
+
+_DECISION_LOG_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [
+        {"path": "/\"_etag\"/?"},
+        {"path": "/generated_comment/*"}
+    ],
+    "compositeIndexes": [
+        [
+            {"path": "/department", "order": "ascending"},
+            {"path": "/timestamp", "order": "descending"}
+        ]
+    ]
+}
+
+
+def _install_orjson_codec() -> None:
+    """
+    Route the Cosmos SDK's request/response JSON handling through orjson
+    
+    The SDK serializes request bodies and parses responses with stdlib json
+    in its request modules; decision payloads (comments, citations) make
+    that measurable. Payloads orjson cannot encode fall back to stdlib json.
+    """
+    try:
+        import orjson
+        from azure.cosmos import _synchronized_request
+        from azure.cosmos.aio import _asynchronous_request
+    except ImportError:
+        return
+    
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            return json.dumps(obj, **kwargs)
+    
+    codec = types.SimpleNamespace(
+        dumps=dumps,
+        loads=orjson.loads,
+        JSONDecodeError=json.JSONDecodeError
+    )
+    for module in (_synchronized_request, _asynchronous_request):
+        if getattr(module, "json", None) is json:
+            module.json = codec
+
+
+_install_orjson_codec()
+
+
+@lru_cache(maxsize=64)
+def _decision_query(
+    fields: Tuple[str, ...],
+    has_dept: bool,
+    has_start: bool,
+    has_end: bool
+) -> str:
+    """
+    Build the decision log query text for a projection and filter combination
+    """
+    if fields:
+        invalid = [field for field in fields if not _FIELD_NAME_RE.match(field)]
+        if invalid:
+            raise ValueError(f"Invalid decision log field names: {invalid}")
+        projection = ", ".join(f"c.{field}" for field in fields)
+    else:
+        projection = "*"
+    
+    return f"SELECT {projection} {_QUERY_TEMPLATES[(has_dept, has_start, has_end)]}"
+
+
+def _latest_pointer(decision_log: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the latest-decision document pointing at a decision log
+    """
+    return {**decision_log, "id": decision_log["ticket_id"], "decision_id": decision_log["id"]}
+
+
+def _pointer_order(pointer: Dict[str, Any]) -> Tuple[str, int]:
+    """
+    Sort key of the decision a pointer refers to
+    
+    Timestamps are ISO-8601 UTC, so they compare as strings; the id's
+    sequence suffix breaks ties between decisions logged in the same
+    microsecond by this process.
+    """
+    suffix = pointer["decision_id"].rsplit("_", 1)[-1]
+    return pointer["timestamp"], int(suffix) if suffix.isdigit() else -1
+
+
+def _get_write_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _write_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
+        _write_semaphores[loop] = semaphore
+    return semaphore
+
 
 class CosmosDBDecisionLogger:
     """
@@ -19,6 +166,8 @@ class CosmosDBDecisionLogger:
     - 7-year retention policy (2555 days TTL)
     - Partition by department for scalability
     - Point-in-time recovery enabled
+    - Latest-decision pointer per ticket for point-read lookups
+    - Async logging over a shared aiohttp connection pool
     """
     
     def __init__(
@@ -26,12 +175,14 @@ class CosmosDBDecisionLogger:
         endpoint: Optional[str] = None,
         key: Optional[str] = None,
         database_name: str = "JiraTriageDB",
-        container_name: str = "DecisionLogs"
+        container_name: str = "DecisionLogs",
+        latest_container_name: str = "LatestDecisions"
     ):
         self.endpoint = endpoint or os.environ.get("COSMOS_ENDPOINT")
         self.key = key or os.environ.get("COSMOS_KEY")
         self.database_name = database_name
         self.container_name = container_name
+        self.latest_container_name = latest_container_name
         
         if not self.endpoint or not self.key:
             print("Warning: Azure Cosmos DB not configured. Logs will not be persisted.")
@@ -39,9 +190,10 @@ class CosmosDBDecisionLogger:
             return
         
         self.configured = True
-        self.client = CosmosClient(self.endpoint, self.key)
+        self.client = CosmosClient(self.endpoint, self.key, transport=get_shared_sync_transport())
         self.database = None
         self.container = None
+        self.latest_container = None
         
         self._initialize_database()
     
@@ -60,7 +212,15 @@ class CosmosDBDecisionLogger:
             self.container = self.database.create_container_if_not_exists(
                 id=self.container_name,
                 partition_key=PartitionKey(path="/department"),
-                default_ttl=2555 * 24 * 60 * 60
+                indexing_policy=_DECISION_LOG_INDEXING_POLICY,
+                default_ttl=_SEVEN_YEAR_TTL_SECONDS
+            )
+            
+            self.latest_container = self.database.create_container_if_not_exists(
+                id=self.latest_container_name,
+                partition_key=PartitionKey(path="/ticket_id"),
+                indexing_policy=_LATEST_DECISION_INDEXING_POLICY,
+                default_ttl=_SEVEN_YEAR_TTL_SECONDS
             )
             
             print(f"Cosmos DB '{self.database_name}' initialized successfully.")
@@ -77,11 +237,14 @@ class CosmosDBDecisionLogger:
         """
         Log an immutable decision record to Cosmos DB
         
+        Only the decision log write is waited on; the ticket's latest-decision
+        pointer is upserted on a background thread.
+        
         Args:
             ticket_id: Unique ticket identifier
             issue_key: JIRA issue key (e.g., PROJ-123)
             decision_data: Complete decision payload from agent
-            
+        
         Returns:
             Decision log ID or None if not configured
         """
@@ -89,12 +252,96 @@ class CosmosDBDecisionLogger:
             print(f"[MOCK LOG] Decision for {issue_key}: {decision_data.get('classification', {}).get('department', 'Unknown')}")
             return None
         
-        timestamp = datetime.utcnow()
-        decision_log = {
-            "id": f"{ticket_id}_{int(timestamp.timestamp())}",
+        decision_log = self._build_decision_log(ticket_id, issue_key, decision_data)
+        
+        try:
+            result = self.container.create_item(body=decision_log)
+            print(f"Decision logged: {result['id']}")
+            self._latest_writer.submit(self._upsert_latest, decision_log)
+            return result['id']
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"Error logging decision: {e}")
+            return None
+    
+    async def alog_decision(
+        self,
+        ticket_id: str,
+        issue_key: str,
+        decision_data: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Async variant of log_decision using the aio CosmosClient
+        
+        At most MAX_CONCURRENT_WRITES calls are in flight per event loop;
+        the rest wait on a semaphore.
+        """
+        if not self.configured:
+            print(f"[MOCK LOG] Decision for {issue_key}: {decision_data.get('classification', {}).get('department', 'Unknown')}")
+            return None
+        
+        decision_log = self._build_decision_log(ticket_id, issue_key, decision_data)
+        
+        async with _get_write_semaphore():
+            return await self._awrite_decision_log(decision_log)
+    
+    async def alog_decisions(
+        self,
+        records: List[Tuple[str, str, Dict[str, Any]]]
+    ) -> List[Optional[str]]:
+        """
+        Log many decision records concurrently
+        
+        Unlike log_decisions_batch, writes to different partitions overlap
+        on the shared connection pool instead of being grouped per partition.
+        
+        Args:
+            records: (ticket_id, issue_key, decision_data) tuples
+        
+        Returns:
+            Decision log ID (or None on failure) for each record, in order
+        """
+        return await asyncio.gather(*(
+            self.alog_decision(ticket_id, issue_key, decision_data)
+            for ticket_id, issue_key, decision_data in records
+        ))
+    
+    async def _awrite_decision_log(self, decision_log: Dict[str, Any]) -> Optional[str]:
+        try:
+            database = get_loop_client((self, "cosmos"), self._create_async_client).get_database_client(
+                self.database_name
+            )
+            result = await database.get_container_client(self.container_name).create_item(
+                body=decision_log
+            )
+            print(f"Decision logged: {result['id']}")
+            await self._aupsert_latest(
+                database.get_container_client(self.latest_container_name),
+                decision_log
+            )
+            return result['id']
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"Error logging decision: {e}")
+            return None
+    
+    def _create_async_client(self) -> AsyncCosmosClient:
+        return AsyncCosmosClient(self.endpoint, self.key, transport=get_shared_transport())
+    
+    def _build_decision_log(
+        self,
+        ticket_id: str,
+        issue_key: str,
+        decision_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Build the Cosmos DB document for a single decision
+        """
+        now_ns = time.time_ns()
+        epoch_s = now_ns // 1_000_000_000
+        return {
+            "id": f"{ticket_id}_{epoch_s}_{next(_DECISION_SEQUENCE)}",
             "ticket_id": ticket_id,
             "issue_key": issue_key,
-            "timestamp": timestamp.isoformat(),
+            "timestamp": datetime.fromtimestamp(now_ns / 1e9, tz=timezone.utc).isoformat(),
             "department": decision_data.get("classification", {}).get("department", "General"),
             "team": decision_data.get("classification", {}).get("team", "Support"),
             "classification": decision_data.get("classification"),
@@ -103,24 +350,166 @@ class CosmosDBDecisionLogger:
             "policy_flags": decision_data.get("policy_flags", []),
             "confidence": decision_data.get("confidence", 0.0),
             "model_used": decision_data.get("model_used", "unknown"),
-            "requires_human_review": decision_data.get("requires_human_review", False),
-            "ttl": 2555 * 24 * 60 * 60
+            "requires_human_review": decision_data.get("requires_human_review", False)
         }
+    
+    @cached_property
+    def _latest_writer(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=LATEST_POINTER_WORKERS,
+            thread_name_prefix="cosmos-latest"
+        )
+    
+    def _upsert_latest(self, decision_log: Dict[str, Any]) -> None:
+        """
+        Point the ticket's latest-decision document at this decision log
         
+        Pointer writes for one ticket can run concurrently and finish out of
+        order, so the pointer is only replaced when this decision is newer
+        than the one it holds, and only if it has not changed since it was
+        read (etag match). A lost race re-reads and retries. Costs one point
+        read (~1 RU) on top of the write.
+        """
+        pointer = _latest_pointer(decision_log)
+        ticket_id = pointer["id"]
         try:
-            result = self.container.create_item(body=decision_log)
-            print(f"Decision logged: {result['id']}")
-            return result['id']
+            for _ in range(LATEST_POINTER_MAX_ATTEMPTS):
+                try:
+                    current = self.latest_container.read_item(item=ticket_id, partition_key=ticket_id)
+                except exceptions.CosmosResourceNotFoundError:
+                    try:
+                        self.latest_container.create_item(body=pointer)
+                        return
+                    except exceptions.CosmosResourceExistsError:
+                        continue
+                
+                if _pointer_order(current) >= _pointer_order(pointer):
+                    return
+                try:
+                    self.latest_container.replace_item(
+                        item=ticket_id,
+                        body=pointer,
+                        etag=current["_etag"],
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                    return
+                except exceptions.CosmosAccessConditionFailedError:
+                    continue
+            print(f"Warning: Latest decision for {ticket_id} not updated after {LATEST_POINTER_MAX_ATTEMPTS} attempts")
         except exceptions.CosmosHttpResponseError as e:
-            print(f"Error logging decision: {e}")
-            return None
+            print(f"Error updating latest decision: {e}")
+    
+    @staticmethod
+    async def _aupsert_latest(latest_container, decision_log: Dict[str, Any]) -> None:
+        """
+        Async variant of _upsert_latest against an aio container client
+        """
+        pointer = _latest_pointer(decision_log)
+        ticket_id = pointer["id"]
+        try:
+            for _ in range(LATEST_POINTER_MAX_ATTEMPTS):
+                try:
+                    current = await latest_container.read_item(item=ticket_id, partition_key=ticket_id)
+                except exceptions.CosmosResourceNotFoundError:
+                    try:
+                        await latest_container.create_item(body=pointer)
+                        return
+                    except exceptions.CosmosResourceExistsError:
+                        continue
+                
+                if _pointer_order(current) >= _pointer_order(pointer):
+                    return
+                try:
+                    await latest_container.replace_item(
+                        item=ticket_id,
+                        body=pointer,
+                        etag=current["_etag"],
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                    return
+                except exceptions.CosmosAccessConditionFailedError:
+                    continue
+            print(f"Warning: Latest decision for {ticket_id} not updated after {LATEST_POINTER_MAX_ATTEMPTS} attempts")
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"Error updating latest decision: {e}")
+    
+    def log_decisions_batch(
+        self,
+        records: List[Tuple[str, str, Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        Log many decision records using one TransactionalBatch per partition
+        
+        Records are grouped by department (the partition key) so each group
+        costs one round-trip per 100 items instead of one per item. Separate
+        partitions are written in parallel. Latest-decision pointers are then
+        upserted concurrently, one per ticket.
+        
+        Args:
+            records: (ticket_id, issue_key, decision_data) tuples
+        
+        Returns:
+            IDs of the decision logs that were written
+        """
+        if not self.configured:
+            for ticket_id, issue_key, decision_data in records:
+                self.log_decision(ticket_id, issue_key, decision_data)
+            return []
+        
+        buckets: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for ticket_id, issue_key, decision_data in records:
+            decision_log = self._build_decision_log(ticket_id, issue_key, decision_data)
+            buckets[decision_log["department"]].append(decision_log)
+        
+        if not buckets:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(buckets))) as executor:
+            written = [
+                decision_log
+                for logs in executor.map(lambda item: self._execute_partition_batch(*item), buckets.items())
+                for decision_log in logs
+            ]
+        
+        # Only the last decision per ticket needs a pointer
+        latest = {decision_log["ticket_id"]: decision_log for decision_log in written}
+        list(self._latest_writer.map(self._upsert_latest, latest.values()))
+        
+        return [decision_log["id"] for decision_log in written]
+    
+    def _execute_partition_batch(
+        self,
+        department: str,
+        decision_logs: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Write decision logs for one partition in TransactionalBatch chunks
+        
+        Returns:
+            The decision logs that were written
+        """
+        logged = []
+        for i in range(0, len(decision_logs), TRANSACTIONAL_BATCH_LIMIT):
+            chunk = decision_logs[i:i + TRANSACTIONAL_BATCH_LIMIT]
+            try:
+                self.container.execute_item_batch(
+                    batch_operations=[("create", (item,)) for item in chunk],
+                    partition_key=department
+                )
+                logged.extend(chunk)
+            except exceptions.CosmosHttpResponseError as e:
+                print(f"Error logging decision batch for {department}: {e}")
+        
+        print(f"Decisions logged for {department}: {len(logged)}")
+        return logged
     
     def query_decisions(
         self,
         department: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        max_items: int = 100
+        max_items: int = 100,
+        fields: Optional[List[str]] = None
     ) -> list[Dict[str, Any]]:
         """
         Query decision logs with filters
@@ -130,56 +519,120 @@ class CosmosDBDecisionLogger:
             start_date: Filter by start date
             end_date: Filter by end date
             max_items: Maximum number of items to return
-            
+            fields: Document fields to project (e.g. ["id", "ticket_id",
+                "confidence"]); all fields are returned when omitted
+        
         Returns:
             List of decision log records
         """
+        items: list[Dict[str, Any]] = []
+        for page in self.iter_decision_pages(
+            department=department,
+            start_date=start_date,
+            end_date=end_date,
+            fields=fields,
+            page_size=max_items
+        ):
+            items.extend(page)
+            if len(items) >= max_items:
+                break
+        
+        return items[:max_items]
+    
+    def iter_decision_pages(
+        self,
+        department: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        fields: Optional[List[str]] = None,
+        page_size: int = 100
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Lazily yield pages of decision logs, fetching each page on demand
+        
+        Args:
+            department: Filter by department
+            start_date: Filter by start date
+            end_date: Filter by end date
+            fields: Document fields to project; all fields when omitted
+            page_size: Maximum number of items per page
+        
+        Yields:
+            Lists of decision log records, newest first
+        """
         if not self.configured:
-            return []
+            return
         
-        query = "SELECT * FROM c WHERE 1=1"
+        query = _decision_query(
+            tuple(fields or ()),
+            bool(department),
+            bool(start_date),
+            bool(end_date)
+        )
         parameters = []
         
         if department:
-            query += " AND c.department = @department"
             parameters.append({"name": "@department", "value": department})
+            partition_options = {"partition_key": department}
+        else:
+            partition_options = {"enable_cross_partition_query": True}
         
         if start_date:
-            query += " AND c.timestamp >= @start_date"
             parameters.append({"name": "@start_date", "value": start_date.isoformat()})
         
         if end_date:
-            query += " AND c.timestamp <= @end_date"
             parameters.append({"name": "@end_date", "value": end_date.isoformat()})
         
-        query += " ORDER BY c.timestamp DESC"
-        
         try:
-            items = list(self.container.query_items(
+            pages = self.container.query_items(
                 query=query,
                 parameters=parameters,
-                max_item_count=max_items
-            ))
-            return items
+                max_item_count=page_size,
+                **partition_options
+            ).by_page()
+            for page in pages:
+                yield list(page)
         except exceptions.CosmosHttpResponseError as e:
             print(f"Error querying decisions: {e}")
-            return []
     
-    def get_decision_by_ticket(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+    def get_decision_by_ticket(
+        self,
+        ticket_id: str,
+        department: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Retrieve the most recent decision for a specific ticket
+        
+        Uses a point read (~1 RU) against the latest-decision container and
+        only falls back to querying the decision log if no pointer exists.
+        Passing department keeps that fallback query within one partition.
         """
         if not self.configured:
             return None
         
+        try:
+            latest = self.latest_container.read_item(item=ticket_id, partition_key=ticket_id)
+            latest["id"] = latest.pop("decision_id")
+            return latest
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"Error reading latest decision: {e}")
+        
         query = "SELECT * FROM c WHERE c.ticket_id = @ticket_id ORDER BY c.timestamp DESC"
         parameters = [{"name": "@ticket_id", "value": ticket_id}]
         
+        if department:
+            partition_options = {"partition_key": department}
+        else:
+            partition_options = {"enable_cross_partition_query": True}
+        
         try:
             items = list(self.container.query_items(
                 query=query,
                 parameters=parameters,
-                max_item_count=1
+                max_item_count=1,
+                **partition_options
             ))
             return items[0] if items else None
         except exceptions.CosmosHttpResponseError as e:
@@ -187,4 +640,17 @@ class CosmosDBDecisionLogger:
             return None
 
 
-decision_logger = CosmosDBDecisionLogger()
+@lru_cache(maxsize=1)
+def get_decision_logger() -> CosmosDBDecisionLogger:
+    """
+    Return the process-wide decision logger, creating it on first use
+    """
+    return CosmosDBDecisionLogger()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from azure_cosmos import decision_logger` working without creating
+    # the logger at import time
+    if name == "decision_logger":
+        return get_decision_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,9 +4,23 @@ Centralized secret management for API keys and connection strings
 """
 
 import os
-from typing import Optional, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Optional, Dict, Tuple
 from azure.keyvault.secrets import SecretClient
+from azure.keyvault.secrets.aio import SecretClient as AsyncSecretClient
 from azure.identity import DefaultAzureCredential, ClientSecretCredential
+from azure.identity.aio import (
+    DefaultAzureCredential as AsyncDefaultAzureCredential,
+    ClientSecretCredential as AsyncClientSecretCredential
+)
+
+from async_transport import get_loop_client, get_shared_sync_transport, get_shared_transport
+
+
+SECRET_CACHE_TTL_SECONDS = 300.0
 
 
 class KeyVaultManager:
@@ -18,10 +32,14 @@ class KeyVaultManager:
     - Automatic secret rotation support
     - Managed Identity authentication
     - Fallback to environment variables for development
+    - In-process TTL cache to avoid repeated Key Vault round-trips
+    - Async retrieval over a shared aiohttp connection pool
     """
     
     def __init__(self, vault_url: Optional[str] = None):
         self.vault_url = vault_url or os.environ.get("AZURE_KEYVAULT_URL")
+        self._cache: Dict[str, Tuple[str, float]] = {}
+        self._cache_lock = threading.Lock()
         
         if not self.vault_url:
             print("Warning: Azure Key Vault not configured. Using environment variables.")
@@ -44,7 +62,11 @@ class KeyVaultManager:
             else:
                 credential = DefaultAzureCredential()
             
-            self.client = SecretClient(vault_url=self.vault_url, credential=credential)
+            self.client = SecretClient(
+                vault_url=self.vault_url,
+                credential=credential,
+                transport=get_shared_sync_transport()
+            )
             print(f"Connected to Azure Key Vault: {self.vault_url}")
         except Exception as e:
             print(f"Error initializing Key Vault client: {e}")
@@ -65,8 +87,35 @@ class KeyVaultManager:
             env_name = secret_name.replace("-", "_").upper()
             return os.environ.get(env_name)
         
+        cached = self._get_cached(secret_name)
+        if cached is not None:
+            return cached
+        
         try:
             secret = self.client.get_secret(secret_name)
+            self._store(secret_name, secret.value)
+            return secret.value
+        except Exception as e:
+            print(f"Error retrieving secret '{secret_name}': {e}")
+            env_name = secret_name.replace("-", "_").upper()
+            return os.environ.get(env_name)
+    
+    async def aget_secret(self, secret_name: str) -> Optional[str]:
+        """
+        Async variant of get_secret using the aio SecretClient
+        """
+        if not self.configured:
+            env_name = secret_name.replace("-", "_").upper()
+            return os.environ.get(env_name)
+        
+        cached = self._get_cached(secret_name)
+        if cached is not None:
+            return cached
+        
+        try:
+            client = get_loop_client((self, "secrets"), self._create_async_client)
+            secret = await client.get_secret(secret_name)
+            self._store(secret_name, secret.value)
             return secret.value
         except Exception as e:
             print(f"Error retrieving secret '{secret_name}': {e}")
@@ -90,6 +139,7 @@ class KeyVaultManager:
         
         try:
             self.client.set_secret(secret_name, secret_value)
+            self._invalidate(secret_name)
             print(f"Secret '{secret_name}' stored successfully")
             return True
         except Exception as e:
@@ -112,6 +162,7 @@ class KeyVaultManager:
         
         try:
             self.client.begin_delete_secret(secret_name).wait()
+            self._invalidate(secret_name)
             print(f"Secret '{secret_name}' deleted successfully")
             return True
         except Exception as e:
@@ -138,13 +189,59 @@ class KeyVaultManager:
             "Azure-Client-Secret"
         ]
         
-        config = {}
-        for name in secret_names:
-            value = self.get_secret(name)
-            if value:
-                config[name] = value
+        with ThreadPoolExecutor(max_workers=len(secret_names)) as executor:
+            values = executor.map(self.get_secret, secret_names)
+            return {name: value for name, value in zip(secret_names, values) if value}
+    
+    def _get_cached(self, secret_name: str) -> Optional[str]:
+        with self._cache_lock:
+            cached = self._cache.get(secret_name)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+    
+    def _store(self, secret_name: str, secret_value: str) -> None:
+        with self._cache_lock:
+            self._cache[secret_name] = (secret_value, time.monotonic() + SECRET_CACHE_TTL_SECONDS)
+    
+    def _create_async_client(self) -> AsyncSecretClient:
+        tenant_id = os.environ.get("AZURE_TENANT_ID")
+        client_id = os.environ.get("AZURE_CLIENT_ID")
+        client_secret = os.environ.get("AZURE_CLIENT_SECRET")
         
-        return config
+        if all([tenant_id, client_id, client_secret]):
+            credential = AsyncClientSecretCredential(
+                tenant_id=tenant_id,
+                client_id=client_id,
+                client_secret=client_secret,
+                transport=get_shared_transport()
+            )
+        else:
+            credential = AsyncDefaultAzureCredential()
+        
+        return AsyncSecretClient(
+            vault_url=self.vault_url,
+            credential=credential,
+            transport=get_shared_transport()
+        )
+    
+    def _invalidate(self, secret_name: str) -> None:
+        """Drop a cached secret value after it changes in Key Vault"""
+        with self._cache_lock:
+            self._cache.pop(secret_name, None)
+
+
+@lru_cache(maxsize=1)
+def get_keyvault() -> KeyVaultManager:
+    """
+    Return the process-wide Key Vault manager, creating it on first use
+    """
+    return KeyVaultManager()
 
 
-keyvault = KeyVaultManager()
+def __getattr__(name: str) -> Any:
+    # Keeps `from azure_keyvault import keyvault` working without creating
+    # the Key Vault client at import time
+    if name == "keyvault":
+        return get_keyvault()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,55 @@
+"""
+Circuit Breaker
+Fast-fail guard for calls to a dependency that is failing
+"""
+
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    States:
+    - closed: calls pass through; fail_max consecutive failures open it
+    - open: calls are refused until reset_timeout seconds have passed
+    - half-open: a single trial call is let through; success closes the
+      breaker, failure opens it again
+    """
+    
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        Whether a call may be attempted now
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.fail_max:
+                if self._opened_at is None:
+                    print(f"Warning: Circuit breaker '{self.name}' opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
@@ -2,12 +2,25 @@
 External system connectors for knowledge base integration
 """
 
-from .confluence_connector import confluence, ConfluenceConnector
-from .sharepoint_connector import sharepoint, SharePointConnector
+from typing import Any
+
+from .confluence_connector import get_confluence, ConfluenceConnector
+from .sharepoint_connector import get_sharepoint, SharePointConnector
 
 __all__ = [
     "confluence",
     "sharepoint",
+    "get_confluence",
+    "get_sharepoint",
     "ConfluenceConnector",
     "SharePointConnector"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # confluence and sharepoint are created on first access, not at import
+    if name == "confluence":
+        return get_confluence()
+    if name == "sharepoint":
+        return get_sharepoint()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,144 @@
+"""
+Shared HTTP client settings for the knowledge base connectors
+"""
+
+import asyncio
+import importlib.util
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+import httpx
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# HTTP/2 multiplexing needs the optional h2 package (httpx[http2])
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# Per-phase limits so an unreachable host fails in ~3s instead of stalling a
+# retry attempt for a single 30s ceiling
+DEFAULT_TIMEOUT = httpx.Timeout(connect=3.0, read=10.0, write=10.0, pool=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRY_AFTER_MAX_SECONDS = 30.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def create_client(**kwargs: Any) -> httpx.Client:
+    """
+    Create a pooled sync client with the connector defaults
+    """
+    return httpx.Client(
+        http2=HTTP2_ENABLED,
+        timeout=DEFAULT_TIMEOUT,
+        limits=DEFAULT_LIMITS,
+        **kwargs
+    )
+
+
+def create_async_client(**kwargs: Any) -> httpx.AsyncClient:
+    """
+    Create a pooled async client with the connector defaults
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        timeout=DEFAULT_TIMEOUT,
+        limits=DEFAULT_LIMITS,
+        **kwargs
+    )
+
+
+def parse_json(response: httpx.Response) -> Any:
+    """
+    Decode a JSON response body, with orjson when it is installed
+    """
+    if orjson is None:
+        return response.json()
+    return orjson.loads(response.content)
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    """
+    Seconds to wait before the next attempt
+    
+    Honors the server's Retry-After (seconds or HTTP date) when present,
+    otherwise exponential backoff with jitter.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), RETRY_AFTER_MAX_SECONDS)
+    
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, RETRY_BASE_DELAY)
+
+
+def request_with_retry(
+    client: httpx.Client,
+    method: str,
+    url: str,
+    stream: bool = False,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Send a request, retrying transport errors and 429/5xx responses
+    
+    The last response is returned as-is (callers still raise_for_status);
+    the last transport error is re-raised. With stream=True the body is not
+    read and the caller must close the returned response.
+    """
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        response = None
+        try:
+            response = client.send(client.build_request(method, url, **kwargs), stream=stream)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if stream and attempt < RETRY_MAX_ATTEMPTS - 1:
+                response.close()
+        except httpx.TransportError:
+            if attempt == RETRY_MAX_ATTEMPTS - 1:
+                raise
+        if attempt < RETRY_MAX_ATTEMPTS - 1:
+            time.sleep(_retry_delay(attempt, response))
+    return response
+
+
+async def arequest_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    stream: bool = False,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Async variant of request_with_retry
+    """
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        response = None
+        try:
+            response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if stream and attempt < RETRY_MAX_ATTEMPTS - 1:
+                await response.aclose()
+        except httpx.TransportError:
+            if attempt == RETRY_MAX_ATTEMPTS - 1:
+                raise
+        if attempt < RETRY_MAX_ATTEMPTS - 1:
+            await asyncio.sleep(_retry_delay(attempt, response))
+    return response
@@ -3,11 +3,62 @@ Confluence Cloud REST API Connector
 Permission-aware retrieval with ACL filtering
 """
 
+import html
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Hashable, Optional, Tuple
 import httpx
 from datetime import datetime
 
+from async_transport import get_loop_client
+from ._http import arequest_with_retry, create_async_client, create_client, parse_json, request_with_retry
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
+# Bodies larger than this go through selectolax when it is installed
+_HTML_PARSER_THRESHOLD = 4096
+
+def _strip_tags(html_content: str) -> str:
+    # Tags become separators and entities are decoded, matching _parse_text
+    return _WS_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', html_content))).strip()
+
+
+def _parse_text(html_content: str) -> str:
+    return _WS_RE.sub(' ', HTMLParser(html_content).text(separator=' ')).strip()
+
+
+# Backslash and double quote must be escaped inside a CQL string literal
+_CQL_ESCAPE = str.maketrans({'"': r'\"', "\\": r"\\"})
+
+
+def _cql_literal(value: str) -> str:
+    """Quote a value as a CQL string literal"""
+    return f'"{value.translate(_CQL_ESCAPE)}"'
+
+
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_TTL_SECONDS = 60.0
+
+
+@lru_cache(maxsize=64)
+def _space_filter(space_keys: Tuple[str, ...]) -> str:
+    """Build the parenthesized CQL space clause for a set of space keys"""
+    return "(" + " OR ".join(f"space={_cql_literal(key)}" for key in space_keys) + ")"
+
 
 class ConfluenceConnector:
     """
@@ -18,6 +69,7 @@ class ConfluenceConnector:
     - Permission filtering based on user ACLs
     - Content extraction with metadata
     - Rate limiting and error handling
+    - LRU + TTL cache for repeated searches and page lookups
     """
     
     def __init__(
@@ -29,6 +81,8 @@ class ConfluenceConnector:
         self.base_url = (base_url or os.environ.get("CONFLUENCE_BASE_URL", "")).rstrip("/")
         self.username = username or os.environ.get("CONFLUENCE_USERNAME")
         self.api_token = api_token or os.environ.get("CONFLUENCE_API_TOKEN")
+        self._cache: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         if not all([self.base_url, self.username, self.api_token]):
             print("Warning: Confluence not configured. Using mock data.")
@@ -36,10 +90,7 @@ class ConfluenceConnector:
             return
         
         self.configured = True
-        self.client = httpx.Client(
-            auth=(self.username, self.api_token),
-            timeout=30.0
-        )
+        self.client = create_client(auth=(self.username, self.api_token))
     
     def search_content(
         self,
@@ -63,36 +114,59 @@ class ConfluenceConnector:
         if not self.configured:
             return self._mock_search(query, space_keys, limit)
         
-        cql_query = f'text ~ "{query}" AND type={content_type}'
-        if space_keys:
-            space_filter = " OR ".join([f'space={key}' for key in space_keys])
-            cql_query += f' AND ({space_filter})'
+        cache_key = ("search", query, tuple(space_keys or ()), content_type, limit)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.client.get(
+            response = request_with_retry(
+                self.client,
+                "GET",
                 f"{self.base_url}/rest/api/content/search",
-                params={
-                    "cql": cql_query,
-                    "limit": limit,
-                    "expand": "body.storage,metadata.labels,space,version"
-                }
+                params=self._search_params(query, space_keys, content_type, limit)
             )
             response.raise_for_status()
             
-            data = response.json()
-            results = []
-            
-            for item in data.get("results", []):
-                results.append({
-                    "id": item["id"],
-                    "title": item["title"],
-                    "content": self._extract_text(item.get("body", {}).get("storage", {}).get("value", "")),
-                    "space": item.get("space", {}).get("key"),
-                    "url": f"{self.base_url}{item['_links']['webui']}",
-                    "last_modified": item.get("version", {}).get("when"),
-                    "labels": [label["name"] for label in item.get("metadata", {}).get("labels", {}).get("results", [])]
-                })
+            results = self._parse_search_results(parse_json(response))
+            self._cache_put(cache_key, results)
+            return results
+        except httpx.HTTPStatusError as e:
+            print(f"Confluence API error: {e}")
+            return self._mock_search(query, space_keys, limit)
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return self._mock_search(query, space_keys, limit)
+    
+    async def asearch_content(
+        self,
+        query: str,
+        space_keys: Optional[List[str]] = None,
+        content_type: str = "page",
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of search_content over the loop's shared AsyncClient
+        """
+        if not self.configured:
+            return self._mock_search(query, space_keys, limit)
+        
+        cache_key = ("search", query, tuple(space_keys or ()), content_type, limit)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await arequest_with_retry(
+                self._get_async_client(),
+                "GET",
+                f"{self.base_url}/rest/api/content/search",
+                params=self._search_params(query, space_keys, content_type, limit)
+            )
+            response.raise_for_status()
             
+            results = self._parse_search_results(parse_json(response))
+            self._cache_put(cache_key, results)
             return results
         except httpx.HTTPStatusError as e:
             print(f"Confluence API error: {e}")
@@ -108,35 +182,155 @@ class ConfluenceConnector:
         if not self.configured:
             return None
         
+        cache_key = ("page", page_id)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self.client.get(
+            response = request_with_retry(
+                self.client,
+                "GET",
                 f"{self.base_url}/rest/api/content/{page_id}",
                 params={"expand": "body.storage,space,version,metadata.labels"}
             )
             response.raise_for_status()
             
-            data = response.json()
-            return {
-                "id": data["id"],
-                "title": data["title"],
-                "content": self._extract_text(data.get("body", {}).get("storage", {}).get("value", "")),
-                "space": data.get("space", {}).get("key"),
-                "url": f"{self.base_url}{data['_links']['webui']}",
-                "last_modified": data.get("version", {}).get("when")
-            }
+            page = self._parse_page(parse_json(response))
+            self._cache_put(cache_key, page)
+            return page
         except Exception as e:
             print(f"Error retrieving page: {e}")
             return None
     
+    async def aget_page_by_id(self, page_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of get_page_by_id over the loop's shared AsyncClient
+        """
+        if not self.configured:
+            return None
+        
+        cache_key = ("page", page_id)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await arequest_with_retry(
+                self._get_async_client(),
+                "GET",
+                f"{self.base_url}/rest/api/content/{page_id}",
+                params={"expand": "body.storage,space,version,metadata.labels"}
+            )
+            response.raise_for_status()
+            
+            page = self._parse_page(parse_json(response))
+            self._cache_put(cache_key, page)
+            return page
+        except Exception as e:
+            print(f"Error retrieving page: {e}")
+            return None
+    
+    def invalidate(self, page_id: Optional[str] = None) -> None:
+        """
+        Evict cached results
+        
+        Args:
+            page_id: Evict this page and any cached search containing it;
+                clears the whole cache when omitted
+        """
+        with self._cache_lock:
+            if page_id is None:
+                self._cache.clear()
+                return
+            
+            self._cache.pop(("page", page_id), None)
+            stale = [
+                key for key, (_, value) in self._cache.items()
+                if key[0] == "search" and any(result["id"] == page_id for result in value)
+            ]
+            for key in stale:
+                del self._cache[key]
+    
+    def _cache_get(self, key: Hashable) -> Any:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > RESULT_CACHE_TTL_SECONDS:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+    
+    def _cache_put(self, key: Hashable, value: Any) -> None:
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), value)
+            self._cache.move_to_end(key)
+            if len(self._cache) > RESULT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        return get_loop_client(
+            (self, "confluence"),
+            lambda: create_async_client(auth=(self.username, self.api_token))
+        )
+    
+    @staticmethod
+    def _search_params(
+        query: str,
+        space_keys: Optional[List[str]],
+        content_type: str,
+        limit: int
+    ) -> Dict[str, Any]:
+        cql_query = f"text ~ {_cql_literal(query)} AND type={_cql_literal(content_type)}"
+        if space_keys:
+            cql_query += f" AND {_space_filter(tuple(space_keys))}"
+        
+        return {
+            "cql": cql_query,
+            "limit": limit,
+            "expand": "body.storage,metadata.labels,space,version"
+        }
+    
+    def _parse_search_results(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+        
+        for item in data.get("results", []):
+            results.append({
+                "id": item["id"],
+                "title": item["title"],
+                "content": self._extract_text(item.get("body", {}).get("storage", {}).get("value", "")),
+                "space": item.get("space", {}).get("key"),
+                "url": f"{self.base_url}{item['_links']['webui']}",
+                "last_modified": item.get("version", {}).get("when"),
+                "labels": [label["name"] for label in item.get("metadata", {}).get("labels", {}).get("results", [])]
+            })
+        
+        return results
+    
+    def _parse_page(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": data["id"],
+            "title": data["title"],
+            "content": self._extract_text(data.get("body", {}).get("storage", {}).get("value", "")),
+            "space": data.get("space", {}).get("key"),
+            "url": f"{self.base_url}{data['_links']['webui']}",
+            "last_modified": data.get("version", {}).get("when")
+        }
+    
     def _extract_text(self, html_content: str) -> str:
         """
         Extract plain text from Confluence storage format (HTML)
-        Basic implementation - can be enhanced with BeautifulSoup
+        
+        Large bodies use selectolax's C parser when available; everything
+        else goes through the precompiled tag/whitespace patterns. Both
+        separate adjacent elements with a space and decode entities, so the
+        text does not depend on which path a body takes.
         """
-        import re
-        text = re.sub(r'<[^>]+>', '', html_content)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        if HTMLParser is not None and len(html_content) > _HTML_PARSER_THRESHOLD:
+            return _parse_text(html_content)
+        return _strip_tags(html_content)
     
     def _mock_search(
         self,
@@ -184,9 +378,26 @@ class ConfluenceConnector:
         return filtered[:limit]
     
     def close(self):
-        """Close the HTTP client"""
+        """
+        Close the sync HTTP client
+        
+        Async clients are per event loop and closed by close_async_clients.
+        """
         if self.configured:
             self.client.close()
 
 
-confluence = ConfluenceConnector()
+
+@lru_cache(maxsize=1)
+def get_confluence() -> ConfluenceConnector:
+    """
+    Return the process-wide connector, creating it on first use
+    """
+    return ConfluenceConnector()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from ... import confluence` working without connecting at import time
+    if name == "confluence":
+        return get_confluence()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,11 +3,35 @@ SharePoint Graph API Connector
 ACL-based post-filtering for permission-aware retrieval
 """
 
+import asyncio
+import base64
+import json
 import os
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from contextlib import aclosing, closing
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional, Tuple, Union
 import httpx
 from datetime import datetime
 
+from async_transport import get_loop_client
+from ._http import arequest_with_retry, create_async_client, create_client, parse_json, request_with_retry
+
+
+# Maximum number of sub-requests Microsoft Graph accepts in one $batch call
+GRAPH_BATCH_LIMIT = 20
+
+# Refresh Graph access tokens this long before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+FILE_CHUNK_SIZE = 64 * 1024
+MAX_FILE_BYTES = 4 * 1024 * 1024
+
+
+def _decode_capped(data: Union[bytes, bytearray], max_bytes: int) -> str:
+    return bytes(data[:max_bytes]).decode("utf-8", errors="replace")
+
 
 class SharePointConnector:
     """
@@ -18,8 +42,13 @@ class SharePointConnector:
     - ACL-based permission filtering
     - Content extraction with metadata
     - OAuth2 authentication with Microsoft Graph
+    - Access tokens shared across instances and refreshed before expiry
     """
     
+    # (tenant_id, client_id) -> (access_token, monotonic refresh deadline)
+    _TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    _TOKEN_LOCK = threading.Lock()
+    
     def __init__(
         self,
         tenant_id: Optional[str] = None,
@@ -37,38 +66,64 @@ class SharePointConnector:
         
         self.configured = True
         self.access_token = None
+        self._token_expiry = 0.0
         self.graph_endpoint = "https://graph.microsoft.com/v1.0"
+        # Graph answers /content requests with a redirect to a pre-authenticated download URL
+        self.client = create_client(follow_redirects=True)
         
-        self._authenticate()
+        if not self._get_token():
+            self.configured = False
+    
+    def _get_token(self) -> Optional[str]:
+        """
+        Return a valid access token, authenticating only when the cached one
+        is missing or within TOKEN_REFRESH_MARGIN_SECONDS of expiry
+        """
+        if self.access_token and time.monotonic() < self._token_expiry:
+            return self.access_token
+        
+        cache_key = (self.tenant_id, self.client_id)
+        with self._TOKEN_LOCK:
+            cached = self._TOKEN_CACHE.get(cache_key)
+            if cached is None or time.monotonic() >= cached[1]:
+                self._authenticate()
+                if not self.access_token:
+                    return None
+                self._TOKEN_CACHE[cache_key] = (self.access_token, self._token_expiry)
+            else:
+                self.access_token, self._token_expiry = cached
+        
+        return self.access_token
     
     def _authenticate(self) -> None:
         """
         Authenticate with Microsoft Graph API using client credentials flow
         """
-        if not self.configured:
-            return
-        
+        self.access_token = None
         token_url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
         
         try:
-            response = httpx.post(
+            response = request_with_retry(
+                self.client,
+                "POST",
                 token_url,
                 data={
                     "grant_type": "client_credentials",
                     "client_id": self.client_id,
                     "client_secret": self.client_secret,
                     "scope": "https://graph.microsoft.com/.default"
-                },
-                timeout=30.0
+                }
             )
             response.raise_for_status()
             
-            data = response.json()
+            data = parse_json(response)
             self.access_token = data.get("access_token")
+            self._token_expiry = (
+                time.monotonic() + data.get("expires_in", 3599) - TOKEN_REFRESH_MARGIN_SECONDS
+            )
             print("Successfully authenticated with Microsoft Graph API")
         except Exception as e:
             print(f"Authentication error: {e}")
-            self.configured = False
     
     def search_content(
         self,
@@ -87,56 +142,50 @@ class SharePointConnector:
         Returns:
             List of search results with content and metadata
         """
-        if not self.configured or not self.access_token:
+        if not self.configured or not self._get_token():
             return self._mock_search(query, site_ids, limit)
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        search_body = {
-            "requests": [
-                {
-                    "entityTypes": ["driveItem", "listItem"],
-                    "query": {
-                        "queryString": query
-                    },
-                    "from": 0,
-                    "size": limit
-                }
-            ]
-        }
-        
         try:
-            response = httpx.post(
+            response = request_with_retry(
+                self.client,
+                "POST",
                 f"{self.graph_endpoint}/search/query",
-                json=search_body,
-                headers=headers,
-                timeout=30.0
+                json=self._search_body(query, limit),
+                headers=self._auth_headers()
             )
             response.raise_for_status()
             
-            data = response.json()
-            results = []
-            
-            for request_result in data.get("value", []):
-                for hit in request_result.get("hitsContainers", [{}])[0].get("hits", []):
-                    resource = hit.get("resource", {})
-                    results.append({
-                        "id": resource.get("id"),
-                        "title": resource.get("name") or resource.get("title"),
-                        "content": resource.get("body", {}).get("content", ""),
-                        "url": resource.get("webUrl"),
-                        "last_modified": resource.get("lastModifiedDateTime"),
-                        "author": resource.get("createdBy", {}).get("user", {}).get("displayName"),
-                        "site_id": resource.get("parentReference", {}).get("siteId")
-                    })
-            
-            if site_ids:
-                results = [r for r in results if r.get("site_id") in site_ids]
+            return self._parse_search_results(parse_json(response), site_ids, limit)
+        except httpx.HTTPStatusError as e:
+            print(f"Graph API error: {e}")
+            return self._mock_search(query, site_ids, limit)
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return self._mock_search(query, site_ids, limit)
+    
+    async def asearch_content(
+        self,
+        query: str,
+        site_ids: Optional[List[str]] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of search_content over the loop's shared AsyncClient
+        """
+        if not self.configured or not self._get_token():
+            return self._mock_search(query, site_ids, limit)
+        
+        try:
+            response = await arequest_with_retry(
+                self._get_async_client(),
+                "POST",
+                f"{self.graph_endpoint}/search/query",
+                json=self._search_body(query, limit),
+                headers=self._auth_headers()
+            )
+            response.raise_for_status()
             
-            return results[:limit]
+            return self._parse_search_results(parse_json(response), site_ids, limit)
         except httpx.HTTPStatusError as e:
             print(f"Graph API error: {e}")
             return self._mock_search(query, site_ids, limit)
@@ -144,30 +193,355 @@ class SharePointConnector:
             print(f"Unexpected error: {e}")
             return self._mock_search(query, site_ids, limit)
     
-    def get_file_content(self, drive_id: str, item_id: str) -> Optional[str]:
+    def iter_file_content(
+        self,
+        drive_id: str,
+        item_id: str,
+        chunk_size: int = FILE_CHUNK_SIZE,
+        timeout: Optional[Union[httpx.Timeout, float]] = None
+    ) -> Iterator[bytes]:
+        """
+        Stream raw file bytes from SharePoint without buffering the whole file
+        
+        Yields nothing when the connector is not configured; HTTP errors are
+        raised to the caller.
+        """
+        if not self.configured or not self._get_token():
+            return
+        
+        response = request_with_retry(
+            self.client,
+            "GET",
+            f"{self.graph_endpoint}/drives/{drive_id}/items/{item_id}/content",
+            stream=True,
+            headers=self._auth_headers(),
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        )
+        try:
+            response.raise_for_status()
+            yield from response.iter_bytes(chunk_size)
+        finally:
+            response.close()
+    
+    async def aiter_file_content(
+        self,
+        drive_id: str,
+        item_id: str,
+        chunk_size: int = FILE_CHUNK_SIZE,
+        timeout: Optional[Union[httpx.Timeout, float]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Async variant of iter_file_content over the loop's shared AsyncClient
+        """
+        if not self.configured or not self._get_token():
+            return
+        
+        response = await arequest_with_retry(
+            self._get_async_client(),
+            "GET",
+            f"{self.graph_endpoint}/drives/{drive_id}/items/{item_id}/content",
+            stream=True,
+            headers=self._auth_headers(),
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        )
+        try:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+    
+    def get_file_content(
+        self,
+        drive_id: str,
+        item_id: str,
+        timeout: Optional[Union[httpx.Timeout, float]] = None,
+        max_bytes: int = MAX_FILE_BYTES
+    ) -> Optional[str]:
         """
         Retrieve file content from SharePoint
+        
+        Args:
+            drive_id: Drive containing the file
+            item_id: File item ID
+            timeout: Per-request override for large downloads (defaults to
+                the client's per-phase timeout)
+            max_bytes: Stop downloading after this many bytes; content past
+                the cap is dropped
         """
-        if not self.configured or not self.access_token:
+        if not self.configured or not self._get_token():
             return None
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
+        buffer = bytearray()
+        try:
+            with closing(self.iter_file_content(drive_id, item_id, timeout=timeout)) as chunks:
+                for chunk in chunks:
+                    buffer += chunk
+                    if len(buffer) >= max_bytes:
+                        break
+            
+            return _decode_capped(buffer, max_bytes)
+        except Exception as e:
+            print(f"Error retrieving file content: {e}")
+            return None
+    
+    async def aget_file_content(
+        self,
+        drive_id: str,
+        item_id: str,
+        timeout: Optional[Union[httpx.Timeout, float]] = None,
+        max_bytes: int = MAX_FILE_BYTES
+    ) -> Optional[str]:
+        """
+        Async variant of get_file_content over the loop's shared AsyncClient
+        """
+        if not self.configured or not self._get_token():
+            return None
         
+        buffer = bytearray()
         try:
-            response = httpx.get(
-                f"{self.graph_endpoint}/drives/{drive_id}/items/{item_id}/content",
-                headers=headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
+            async with aclosing(self.aiter_file_content(drive_id, item_id, timeout=timeout)) as chunks:
+                async for chunk in chunks:
+                    buffer += chunk
+                    if len(buffer) >= max_bytes:
+                        break
             
-            return response.text
+            return _decode_capped(buffer, max_bytes)
         except Exception as e:
             print(f"Error retrieving file content: {e}")
             return None
     
+    def get_file_contents_bulk(
+        self,
+        items: List[Tuple[str, str]],
+        max_bytes: int = MAX_FILE_BYTES
+    ) -> Dict[str, str]:
+        """
+        Retrieve many files with Graph JSON batching (20 files per request)
+        
+        Args:
+            items: (drive_id, item_id) pairs
+            max_bytes: Per-file cap, as in get_file_content
+            
+        Returns:
+            Mapping of item_id to file content; failed items are omitted
+        """
+        if not self.configured or not self._get_token():
+            return {}
+        
+        contents: Dict[str, str] = {}
+        for chunk in self._batch_chunks(items):
+            try:
+                response = request_with_retry(
+                    self.client,
+                    "POST",
+                    f"{self.graph_endpoint}/$batch",
+                    json=self._batch_body(chunk),
+                    headers=self._auth_headers()
+                )
+                response.raise_for_status()
+                chunk_contents, downloads = self._parse_batch_response(chunk, parse_json(response), max_bytes)
+            except Exception as e:
+                print(f"Error retrieving file contents batch: {e}")
+                continue
+            
+            contents.update(chunk_contents)
+            for item_id, download_url in downloads.items():
+                content = self._download(item_id, download_url, max_bytes)
+                if content is not None:
+                    contents[item_id] = content
+        
+        return contents
+    
+    async def aget_file_contents_bulk(
+        self,
+        items: List[Tuple[str, str]],
+        max_bytes: int = MAX_FILE_BYTES
+    ) -> Dict[str, str]:
+        """
+        Async variant of get_file_contents_bulk; batches and downloads run concurrently
+        """
+        if not self.configured or not self._get_token():
+            return {}
+        
+        contents: Dict[str, str] = {}
+        for chunk_contents in await asyncio.gather(*(
+            self._afetch_batch(chunk, max_bytes) for chunk in self._batch_chunks(items)
+        )):
+            contents.update(chunk_contents)
+        return contents
+    
+    async def _afetch_batch(self, chunk: List[Tuple[str, str]], max_bytes: int) -> Dict[str, str]:
+        client = self._get_async_client()
+        try:
+            response = await arequest_with_retry(
+                client,
+                "POST",
+                f"{self.graph_endpoint}/$batch",
+                json=self._batch_body(chunk),
+                headers=self._auth_headers()
+            )
+            response.raise_for_status()
+            contents, downloads = self._parse_batch_response(chunk, parse_json(response), max_bytes)
+        except Exception as e:
+            print(f"Error retrieving file contents batch: {e}")
+            return {}
+        
+        downloaded = await asyncio.gather(*(
+            self._adownload(client, item_id, url, max_bytes) for item_id, url in downloads.items()
+        ))
+        for item_id, content in zip(downloads, downloaded):
+            if content is not None:
+                contents[item_id] = content
+        return contents
+    
+    def _download(self, item_id: str, url: str, max_bytes: int) -> Optional[str]:
+        """
+        Stream one pre-authenticated download URL, stopping at max_bytes
+        
+        Failures are logged and return None so the rest of the batch is kept.
+        """
+        buffer = bytearray()
+        try:
+            response = request_with_retry(self.client, "GET", url, stream=True)
+            try:
+                response.raise_for_status()
+                for chunk in response.iter_bytes(FILE_CHUNK_SIZE):
+                    buffer += chunk
+                    if len(buffer) >= max_bytes:
+                        break
+            finally:
+                response.close()
+        except Exception as e:
+            print(f"Error retrieving file content for {item_id}: {e}")
+            return None
+        return _decode_capped(buffer, max_bytes)
+    
+    async def _adownload(
+        self,
+        client: httpx.AsyncClient,
+        item_id: str,
+        url: str,
+        max_bytes: int
+    ) -> Optional[str]:
+        buffer = bytearray()
+        try:
+            response = await arequest_with_retry(client, "GET", url, stream=True)
+            try:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(FILE_CHUNK_SIZE):
+                    buffer += chunk
+                    if len(buffer) >= max_bytes:
+                        break
+            finally:
+                await response.aclose()
+        except Exception as e:
+            print(f"Error retrieving file content for {item_id}: {e}")
+            return None
+        return _decode_capped(buffer, max_bytes)
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        return get_loop_client(
+            (self, "sharepoint"),
+            lambda: create_async_client(follow_redirects=True)
+        )
+    
+    @staticmethod
+    def _batch_chunks(items: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        return [items[i:i + GRAPH_BATCH_LIMIT] for i in range(0, len(items), GRAPH_BATCH_LIMIT)]
+    
+    @staticmethod
+    def _batch_body(chunk: List[Tuple[str, str]]) -> Dict[str, Any]:
+        return {
+            "requests": [
+                {
+                    "id": str(i),
+                    "method": "GET",
+                    "url": f"/drives/{drive_id}/items/{item_id}/content"
+                }
+                for i, (drive_id, item_id) in enumerate(chunk)
+            ]
+        }
+    
+    @staticmethod
+    def _parse_batch_response(
+        chunk: List[Tuple[str, str]],
+        data: Dict[str, Any],
+        max_bytes: int = MAX_FILE_BYTES
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Split $batch sub-responses into inline contents and download URLs
+        
+        Graph usually answers /content with a 302 to a pre-authenticated
+        URL; inline bodies of non-JSON content come back base64-encoded.
+        Inline contents are capped at max_bytes like downloaded ones.
+        """
+        contents: Dict[str, str] = {}
+        downloads: Dict[str, str] = {}
+        
+        for sub_response in data.get("responses", []):
+            item_id = chunk[int(sub_response["id"])][1]
+            status = sub_response.get("status")
+            
+            if status == 302:
+                downloads[item_id] = sub_response.get("headers", {}).get("Location")
+            elif status == 200:
+                body = sub_response.get("body", "")
+                if isinstance(body, str):
+                    body = base64.b64decode(body)
+                else:
+                    body = json.dumps(body).encode("utf-8")
+                contents[item_id] = _decode_capped(body, max_bytes)
+            else:
+                print(f"Error retrieving file content for {item_id}: HTTP {status}")
+        
+        downloads = {item_id: url for item_id, url in downloads.items() if url}
+        return contents, downloads
+    
+    def _auth_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.access_token}"}
+    
+    @staticmethod
+    def _search_body(query: str, limit: int) -> Dict[str, Any]:
+        return {
+            "requests": [
+                {
+                    "entityTypes": ["driveItem", "listItem"],
+                    "query": {
+                        "queryString": query
+                    },
+                    "from": 0,
+                    "size": limit
+                }
+            ]
+        }
+    
+    @staticmethod
+    def _parse_search_results(
+        data: Dict[str, Any],
+        site_ids: Optional[List[str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        results = []
+        
+        for request_result in data.get("value", []):
+            for hit in request_result.get("hitsContainers", [{}])[0].get("hits", []):
+                resource = hit.get("resource", {})
+                results.append({
+                    "id": resource.get("id"),
+                    "title": resource.get("name") or resource.get("title"),
+                    "content": resource.get("body", {}).get("content", ""),
+                    "url": resource.get("webUrl"),
+                    "last_modified": resource.get("lastModifiedDateTime"),
+                    "author": resource.get("createdBy", {}).get("user", {}).get("displayName"),
+                    "site_id": resource.get("parentReference", {}).get("siteId")
+                })
+        
+        if site_ids:
+            results = [r for r in results if r.get("site_id") in site_ids]
+        
+        return results[:limit]
+    
     def _mock_search(
         self,
         query: str,
@@ -212,6 +586,29 @@ class SharePointConnector:
             filtered = [d for d in mock_documents if d.get("site_id") in site_ids]
         
         return filtered[:limit]
+    
+    def close(self):
+        """
+        Close the sync HTTP client
+        
+        Async clients are per event loop and closed by close_async_clients.
+        """
+        client = getattr(self, "client", None)
+        if client is not None:
+            client.close()
+
+
+
+@lru_cache(maxsize=1)
+def get_sharepoint() -> SharePointConnector:
+    """
+    Return the process-wide connector, creating it on first use
+    """
+    return SharePointConnector()
 
 
-sharepoint = SharePointConnector()
+def __getattr__(name: str) -> Any:
+    # Keeps `from ... import sharepoint` working without connecting at import time
+    if name == "sharepoint":
+        return get_sharepoint()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
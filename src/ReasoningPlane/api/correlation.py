@@ -0,0 +1,28 @@
+"""
+Correlation IDs
+Per-request identifier stamped onto every log record
+"""
+
+import logging
+from contextvars import ContextVar
+
+
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="")
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Logger filter that copies the current correlation ID onto each record
+    
+    Runs on the calling thread, before the record is queued, so the ID of
+    the request that logged it is captured. The ID is also added to the
+    record's custom_dimensions, if any, so exported events can be joined.
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        cid = correlation_id.get()
+        record.correlation_id = cid
+        dimensions = getattr(record, "custom_dimensions", None)
+        if cid and isinstance(dimensions, dict):
+            dimensions.setdefault("correlation_id", cid)
+        return True
@@ -3,31 +3,95 @@ Enhanced DLP/Redaction Engine with ML-based PII Detection
 Uses Presidio Analyzer and Anonymizer for advanced PII detection
 """
 
-from typing import List, Tuple, Dict, Any
-from presidio_analyzer import AnalyzerEngine, RecognizerRegistry
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Dict, Any
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry
 from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig, RecognizerResult
+from presidio_anonymizer.entities import OperatorConfig
 import re
 
 
+_ANALYZER: Optional[AnalyzerEngine] = None
+_ANONYMIZER: Optional[AnonymizerEngine] = None
+_ENGINES_LOCK = threading.Lock()
+
+# Entities whose Presidio recognizers only match text containing a digit or
+# "@". NER-backed types (PERSON, LOCATION, NRP, DATE_TIME) and formats that
+# can be digit-free (URL, IPv6) are deliberately excluded.
+_PATTERN_ONLY_ENTITIES = frozenset({
+    "EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "CRYPTO", "IBAN_CODE",
+    "MEDICAL_LICENSE", "US_BANK_NUMBER", "US_DRIVER_LICENSE", "US_ITIN",
+    "US_PASSPORT", "US_SSN", "UK_NHS"
+})
+_PII_HINT_RE = re.compile(r"[@\d]")
+
+# Texts per spaCy nlp.pipe batch in redact_batch
+REDACT_BATCH_SIZE = 64
+
+# Analyzer results kept per (text, entities) so redaction and risk scoring
+# of the same ticket share one NER pass
+ANALYSIS_CACHE_SIZE = 256
+
+
+def _may_contain_pii(text: str, entities: Iterable[str]) -> bool:
+    """
+    Cheap pre-screen: False only when the analyzer cannot find any of entities
+    """
+    if not _PATTERN_ONLY_ENTITIES.issuperset(entities):
+        return True
+    return _PII_HINT_RE.search(text) is not None
+
+
+def _get_engines() -> Tuple[AnalyzerEngine, AnonymizerEngine]:
+    """
+    Build the Presidio analyzer (with its spaCy model) and anonymizer once
+    per process and share them across engine instances
+    """
+    global _ANALYZER, _ANONYMIZER
+    
+    with _ENGINES_LOCK:
+        if _ANALYZER is None:
+            configuration = {
+                "nlp_engine_name": "spacy",
+                "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
+            }
+            
+            provider = NlpEngineProvider(nlp_configuration=configuration)
+            nlp_engine = provider.create_engine()
+            
+            _ANALYZER = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"])
+            _ANONYMIZER = AnonymizerEngine()
+        
+        return _ANALYZER, _ANONYMIZER
+
+
 class EnhancedDLPEngine:
     """
     Enterprise-grade DLP engine with ML-based PII detection.
     Combines regex patterns with NER models for comprehensive coverage.
     """
     
+    _HIGH_RISK = frozenset({"CREDIT_CARD", "US_SSN", "US_PASSPORT", "CRYPTO", "US_BANK_NUMBER"})
+    
+    _OPERATORS = {
+        "DEFAULT": OperatorConfig("replace", {"new_value": "[REDACTED]"}),
+        "PERSON": OperatorConfig("replace", {"new_value": "[NAME_REDACTED]"}),
+        "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
+        "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
+        "CREDIT_CARD": OperatorConfig("replace", {"new_value": "[CARD_REDACTED]"}),
+        "US_SSN": OperatorConfig("replace", {"new_value": "[SSN_REDACTED]"}),
+        "LOCATION": OperatorConfig("replace", {"new_value": "[LOCATION_REDACTED]"}),
+    }
+    
     def __init__(self):
-        configuration = {
-            "nlp_engine_name": "spacy",
-            "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
-        }
-        
-        provider = NlpEngineProvider(nlp_configuration=configuration)
-        nlp_engine = provider.create_engine()
-        
-        self.analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"])
-        self.anonymizer = AnonymizerEngine()
+        self.analyzer, self.anonymizer = _get_engines()
+        self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
+        self._analyze_cache: OrderedDict = OrderedDict()
+        self._analyze_lock = threading.Lock()
         
         self.external_domain_pattern = re.compile(
             r'@(?!company\.com|internal\.company\.com)',
@@ -41,6 +105,43 @@ class EnhancedDLPEngine:
             "US_BANK_NUMBER", "US_DRIVER_LICENSE", "US_ITIN",
             "US_PASSPORT", "US_SSN", "UK_NHS"
         ]
+        
+        self.output_leak_entity_types = ["EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "US_SSN"]
+        
+        self._entity_flag = {
+            entity_type: f"{entity_type.lower()}_detected"
+            for entity_type in self.pii_entity_types
+        }
+    
+    def _analyze(self, text: str, entities: List[str]) -> List[Any]:
+        """
+        Run the Presidio analyzer, skipping it when the pre-screen rules out
+        every requested entity and reusing cached results for repeated text
+        """
+        if not _may_contain_pii(text, entities):
+            return []
+        
+        key = self._analysis_key(text, entities)
+        with self._analyze_lock:
+            results = self._analyze_cache.get(key)
+            if results is not None:
+                self._analyze_cache.move_to_end(key)
+                return results
+        
+        results = self.analyzer.analyze(text=text, language="en", entities=entities)
+        self._store_analysis(key, results)
+        return results
+    
+    @staticmethod
+    def _analysis_key(text: str, entities: List[str]) -> Tuple[bytes, Tuple[str, ...]]:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest(), tuple(entities)
+    
+    def _store_analysis(self, key: Tuple[bytes, Tuple[str, ...]], results: List[Any]) -> None:
+        with self._analyze_lock:
+            self._analyze_cache[key] = results
+            self._analyze_cache.move_to_end(key)
+            if len(self._analyze_cache) > ANALYSIS_CACHE_SIZE:
+                self._analyze_cache.popitem(last=False)
     
     def redact_sensitive_data(self, text: str) -> Tuple[str, List[str]]:
         """
@@ -52,39 +153,51 @@ class EnhancedDLPEngine:
         if not text:
             return "", []
         
-        results = self.analyzer.analyze(
-            text=text,
+        return self._redact(text, self._analyze(text, self.pii_entity_types))
+    
+    def redact_batch(self, texts: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        Redact many texts with one batched analyzer pass
+        
+        spaCy processes the texts through nlp.pipe in batches of
+        REDACT_BATCH_SIZE, amortizing per-call model overhead.
+        
+        Returns:
+            (redacted_text, list_of_detection_flags) for each text, in order
+        """
+        redacted: List[Tuple[str, List[str]]] = [("", []) for _ in texts]
+        indices = [i for i, text in enumerate(texts) if text]
+        if not indices:
+            return redacted
+        
+        batch_results = self.batch_analyzer.analyze_iterator(
+            texts=[texts[i] for i in indices],
             language="en",
+            batch_size=REDACT_BATCH_SIZE,
             entities=self.pii_entity_types
         )
+        for i, results in zip(indices, batch_results):
+            self._store_analysis(self._analysis_key(texts[i], self.pii_entity_types), results)
+            redacted[i] = self._redact(texts[i], results)
+        return redacted
+    
+    def _redact(self, text: str, results: List[Any]) -> Tuple[str, List[str]]:
+        # Insertion-ordered dedup of the entity types that were hit
+        detected = dict.fromkeys(result.entity_type for result in results)
+        flags = [self._entity_flag[entity_type] for entity_type in detected]
         
-        flags = set()
-        for result in results:
-            flags.add(f"{result.entity_type.lower()}_detected")
-        
-        anonymizer_results = [
-            RecognizerResult(entity_type=r.entity_type, start=r.start, end=r.end, score=r.score)
-            for r in results
-        ]
-        
+        # The anonymizer copies analyzer results before merging overlaps, so
+        # cached results can be passed as-is
         anonymized_result = self.anonymizer.anonymize(
             text=text,
-            analyzer_results=anonymizer_results,
-            operators={
-                "DEFAULT": OperatorConfig("replace", {"new_value": "[REDACTED]"}),
-                "PERSON": OperatorConfig("replace", {"new_value": "[NAME_REDACTED]"}),
-                "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
-                "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
-                "CREDIT_CARD": OperatorConfig("replace", {"new_value": "[CARD_REDACTED]"}),
-                "US_SSN": OperatorConfig("replace", {"new_value": "[SSN_REDACTED]"}),
-                "LOCATION": OperatorConfig("replace", {"new_value": "[LOCATION_REDACTED]"}),
-            }
+            analyzer_results=results,
+            operators=self._OPERATORS
         )
         
         if self.external_domain_pattern.search(text):
-            flags.add("external_email_detected")
+            flags.append("external_email_detected")
         
-        return anonymized_result.text, list(flags)
+        return anonymized_result.text, flags
     
     def detect_high_risk_content(self, text: str) -> Dict[str, Any]:
         """
@@ -93,18 +206,13 @@ class EnhancedDLPEngine:
         Returns:
             Dictionary with risk_score, risk_flags, and requires_review
         """
-        results = self.analyzer.analyze(
-            text=text,
-            language="en",
-            entities=self.pii_entity_types
-        )
+        results = self._analyze(text, self.pii_entity_types)
         
-        high_risk_entities = {"CREDIT_CARD", "US_SSN", "US_PASSPORT", "CRYPTO", "US_BANK_NUMBER"}
         risk_flags = []
         high_confidence_pii = 0
         
         for result in results:
-            if result.entity_type in high_risk_entities:
+            if result.entity_type in self._HIGH_RISK:
                 risk_flags.append(f"high_risk_{result.entity_type.lower()}")
                 high_confidence_pii += 1
             elif result.score > 0.85:
@@ -131,11 +239,7 @@ class EnhancedDLPEngine:
         Returns:
             Tuple of (is_safe, list_of_violations)
         """
-        results = self.analyzer.analyze(
-            text=generated_text,
-            language="en",
-            entities=["EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "US_SSN"]
-        )
+        results = self._analyze(generated_text, self.output_leak_entity_types)
         
         violations = []
         for result in results:
@@ -146,4 +250,17 @@ class EnhancedDLPEngine:
         return is_safe, violations
 
 
-dlp_engine = EnhancedDLPEngine()
+@lru_cache(maxsize=1)
+def get_dlp_engine() -> EnhancedDLPEngine:
+    """
+    Return the process-wide DLP engine, creating it on first use
+    """
+    return EnhancedDLPEngine()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from dlp_engine import dlp_engine` working without creating
+    # the engine and its NLP model at import time
+    if name == "dlp_engine":
+        return get_dlp_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,148 @@
+"""
+Embedding Cache
+Content-addressed embedding reuse with batched calls for cache misses
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+EMBEDDING_CACHE_SIZE = 8192
+EMBEDDING_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Concurrent async misses arriving within the window share one API call
+EMBEDDING_BATCH_WINDOW_MS = 10.0
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _cache_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU embedding cache in front of a LangChain embeddings client
+    
+    Texts are keyed by the SHA-256 of their whitespace-normalized form. All
+    misses in a call go to the API as one embed_documents request, and async
+    callers that miss within EMBEDDING_BATCH_WINDOW_MS of each other are
+    folded into the same request.
+    """
+    
+    def __init__(
+        self,
+        embeddings,
+        max_entries: int = EMBEDDING_CACHE_SIZE,
+        ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS,
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.window = window_ms / 1000
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: dict = {}
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def _get(self, key: str) -> Optional[list[float]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            vector, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return vector
+    
+    def _put(self, key: str, vector: list[float]):
+        with self._lock:
+            self._cache[key] = (vector, time.monotonic() + self.ttl_seconds)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+    
+    def get_or_compute(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts, calling the API once for every text not already cached
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            One vector per input text, in order
+        """
+        normalized = [_normalize(text) for text in texts]
+        keys = [_cache_key(text) for text in normalized]
+        vectors = {key: self._get(key) for key in keys}
+        
+        misses = {key: text for key, text in zip(keys, normalized) if vectors[key] is None}
+        if misses:
+            computed = self.embeddings.embed_documents(list(misses.values()))
+            for key, vector in zip(misses, computed):
+                self._put(key, vector)
+                vectors[key] = vector
+        
+        return [vectors[key] for key in keys]
+    
+    async def aget_or_compute(self, texts: list[str]) -> list[list[float]]:
+        """
+        Async variant of get_or_compute that coalesces concurrent misses
+        """
+        loop = asyncio.get_running_loop()
+        if self._flush_task is not None and self._flush_task.get_loop() is not loop:
+            self._pending = {}
+            self._flush_task = None
+        
+        normalized = [_normalize(text) for text in texts]
+        keys = [_cache_key(text) for text in normalized]
+        vectors = {key: self._get(key) for key in keys}
+        
+        waiting = {}
+        for key, text in zip(keys, normalized):
+            if vectors[key] is not None or key in waiting:
+                continue
+            if key not in self._pending:
+                self._pending[key] = (text, loop.create_future())
+            waiting[key] = self._pending[key][1]
+        
+        if waiting:
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = loop.create_task(self._flush())
+            # Futures are shared by every caller waiting on the same text, so
+            # a cancelled caller must not cancel them for the others
+            for key, future in waiting.items():
+                vectors[key] = await asyncio.shield(future)
+        
+        return [vectors[key] for key in keys]
+    
+    async def _flush(self):
+        # Misses that arrive while a batch is in flight see this task still
+        # running and do not schedule their own, so keep draining until no
+        # caller is left waiting
+        while self._pending:
+            await asyncio.sleep(self.window)
+            pending, self._pending = self._pending, {}
+            await self._embed_pending(pending)
+    
+    async def _embed_pending(self, pending: dict):
+        try:
+            computed = await self.embeddings.aembed_documents([text for text, _ in pending.values()])
+        except Exception as e:
+            for _, future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (key, (_, future)), vector in zip(pending.items(), computed):
+            self._put(key, vector)
+            if not future.done():
+                future.set_result(vector)
@@ -35,6 +35,37 @@ class EnhancedPolicyEngine:
     - Department-specific policies
     """
     
+    _BASE_SLA = {
+        Priority.CRITICAL: SLATarget.CRITICAL,
+        Priority.HIGH: SLATarget.HIGH,
+        Priority.MEDIUM: SLATarget.MEDIUM,
+        Priority.LOW: SLATarget.LOW
+    }
+    
+    _ESCALATION_PATHS = {
+        "IT": {
+            "DBA": ("dba-lead@company.com", "it-director@company.com", "cto@company.com"),
+            "Security": ("security-lead@company.com", "ciso@company.com", "cto@company.com"),
+            "DevOps": ("devops-lead@company.com", "it-director@company.com")
+        },
+        "HR": {
+            "Onboarding": ("hr-lead@company.com", "hr-director@company.com"),
+            "Payroll": ("payroll-lead@company.com", "finance-director@company.com")
+        },
+        "Finance": {
+            "Accounting": ("accounting-lead@company.com", "cfo@company.com")
+        },
+        "Legal": {
+            "Contracts": ("legal-lead@company.com", "general-counsel@company.com")
+        }
+    }
+    
+    _DEFAULT_ESCALATION_PATH = ("support@company.com", "escalations@company.com")
+    
+    _HIGH_RISK_PII = frozenset({
+        "us_ssn_detected", "credit_card_detected", "crypto_detected", "us_passport_detected"
+    })
+    
     def __init__(self):
         self.confidence_threshold = 0.7
         self.external_domain_whitelist = [
@@ -65,6 +96,21 @@ class EnhancedPolicyEngine:
                 "sla_multiplier": 1.0
             }
         }
+        
+        # Flattened views of the policies above for the per-ticket hot path
+        self._internal_domains = frozenset(domain.lower() for domain in self.external_domain_whitelist)
+        self._dept_min_conf = {
+            dept: policy.get("min_confidence", self.confidence_threshold)
+            for dept, policy in self.department_policies.items()
+        }
+        self._dept_multiplier = {
+            dept: policy.get("sla_multiplier", 1.0)
+            for dept, policy in self.department_policies.items()
+        }
+        self._dept_needs_review = frozenset(
+            dept for dept, policy in self.department_policies.items()
+            if policy.get("requires_human_review", False)
+        )
     
     def evaluate_ticket(
         self,
@@ -86,14 +132,13 @@ class EnhancedPolicyEngine:
         department = classification.get("department", "General")
         priority = classification.get("suggested_priority", "Medium")
         confidence = classification.get("confidence", 0.0)
-        redaction_flags = ticket_data.get("redaction_flags", [])
+        redaction_flags = frozenset(ticket_data.get("redaction_flags", ()))
         
         enhanced_flags = list(policy_flags)
         requires_human_review = False
         escalation_reason = []
         
-        dept_policy = self.department_policies.get(department, {})
-        dept_min_confidence = dept_policy.get("min_confidence", self.confidence_threshold)
+        dept_min_confidence = self._dept_min_conf.get(department, self.confidence_threshold)
         
         if confidence < dept_min_confidence:
             enhanced_flags.append("low_confidence_classification")
@@ -105,13 +150,12 @@ class EnhancedPolicyEngine:
             requires_human_review = True
             escalation_reason.append("External email address detected")
         
-        high_risk_pii = ["us_ssn_detected", "credit_card_detected", "crypto_detected", "us_passport_detected"]
-        if any(flag in redaction_flags for flag in high_risk_pii):
+        if redaction_flags & self._HIGH_RISK_PII:
             enhanced_flags.append("high_sensitivity_pii")
             requires_human_review = True
             escalation_reason.append("High-sensitivity PII detected")
         
-        if dept_policy.get("requires_human_review", False):
+        if department in self._dept_needs_review:
             enhanced_flags.append("department_policy_requires_review")
             requires_human_review = True
             escalation_reason.append(f"{department} department requires human review")
@@ -140,12 +184,26 @@ class EnhancedPolicyEngine:
     def _is_external_email(self, email: str) -> bool:
         """
         Check if email is from external domain
+        
+        An address is internal when its domain is a whitelisted domain or a
+        subdomain of one, matched on whole labels: eng.company.com is
+        internal because company.com is listed, while notcompany.com is
+        external. Each label suffix of the domain is looked up in a set.
+        Missing, empty or @-less addresses are not flagged.
         """
-        if not email or "@" not in email:
+        if not email:
+            return False
+        
+        at = email.rfind("@")
+        if at < 0:
             return False
         
-        domain = email.split("@")[1].lower()
-        return not any(domain.endswith(allowed) for allowed in self.external_domain_whitelist)
+        domain = email[at + 1:].lower()
+        while domain:
+            if domain in self._internal_domains:
+                return False
+            domain = domain.partition(".")[2]
+        return True
     
     def _predict_sla(
         self,
@@ -155,15 +213,9 @@ class EnhancedPolicyEngine:
         """
         Predict SLA targets with department-specific adjustments
         """
-        base_sla = {
-            Priority.CRITICAL: SLATarget.CRITICAL,
-            Priority.HIGH: SLATarget.HIGH,
-            Priority.MEDIUM: SLATarget.MEDIUM,
-            Priority.LOW: SLATarget.LOW
-        }.get(priority, SLATarget.MEDIUM)
+        base_sla = self._BASE_SLA.get(priority, SLATarget.MEDIUM)
         
-        dept_policy = self.department_policies.get(department, {})
-        multiplier = dept_policy.get("sla_multiplier", 1.0)
+        multiplier = self._dept_multiplier.get(department, 1.0)
         
         adjusted_sla = base_sla * multiplier
         
@@ -202,25 +254,8 @@ class EnhancedPolicyEngine:
         """
         Get escalation path for a department/team
         """
-        escalation_paths = {
-            "IT": {
-                "DBA": ["dba-lead@company.com", "it-director@company.com", "cto@company.com"],
-                "Security": ["security-lead@company.com", "ciso@company.com", "cto@company.com"],
-                "DevOps": ["devops-lead@company.com", "it-director@company.com"]
-            },
-            "HR": {
-                "Onboarding": ["hr-lead@company.com", "hr-director@company.com"],
-                "Payroll": ["payroll-lead@company.com", "finance-director@company.com"]
-            },
-            "Finance": {
-                "Accounting": ["accounting-lead@company.com", "cfo@company.com"]
-            },
-            "Legal": {
-                "Contracts": ["legal-lead@company.com", "general-counsel@company.com"]
-            }
-        }
-        
-        return escalation_paths.get(department, {}).get(team, ["support@company.com", "escalations@company.com"])
+        path = self._ESCALATION_PATHS.get(department, {}).get(team, self._DEFAULT_ESCALATION_PATH)
+        return list(path)
 
 
 policy_engine = EnhancedPolicyEngine()
@@ -3,18 +3,114 @@ LangGraph Multi-Agent Workflow for JIRA Ticket Triage
 Implements ClassifyNode, RetrieveNode, GenerateNode, PolicyNode with vertical slicing
 """
 
+import asyncio
+import dataclasses
 import os
-from typing import Annotated, TypedDict, Literal
+import re
+from functools import cached_property, lru_cache, partial
+from typing import Annotated, Any, AsyncIterator, Optional, TypedDict, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings, ChatOpenAI, OpenAIEmbeddings
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from pydantic import BaseModel
 import json
 
-from azure_ai_search import search_manager
-from azure_cosmos import decision_logger
-from azure_keyvault import keyvault
+from async_transport import get_llm_async_http_client, get_llm_http_client
+from azure_ai_search import get_search_manager
+from azure_cosmos import get_decision_logger
+from correlation import correlation_id
+from azure_keyvault import get_keyvault
+from embedding_cache import EmbeddingCache
 from enhanced_policy_engine import policy_engine
+from observability import get_observability
+from semantic_cache import CACHE_ENABLED, SemanticCache
+
+# System prompts are module constants so every request sends a byte-identical
+# prefix, which lets the provider's prompt cache reuse it. Per-ticket values
+# belong in the HumanMessage. Allowed classification values are enforced by
+# ClassificationModel's schema, so the classify prompt only covers what the
+# schema cannot express.
+CLASSIFY_SYSTEM_PROMPT = """Classify the JIRA ticket for enterprise IT operations routing.
+suggested_assignee is the owning team lead's email; confidence is 0.0 to 1.0."""
+
+GENERATE_SYSTEM_PROMPT = """You are an AI assistant helping triage JIRA tickets for the department and team named in the ticket.
+
+Generate a professional comment for the ticket that:
+1. Acknowledges the issue
+2. References relevant knowledge base articles (cite by ID)
+3. Provides next steps or initial guidance
+4. Suggests appropriate assignment
+
+Keep responses concise (2-3 sentences). Be helpful but direct."""
+
+# State produced by classify/retrieve. The comment quotes the ticket it was
+# written for, so generate is re-run on a hit, as is policy, which depends on
+# the reporter and redaction flags
+_CACHED_STATE_KEYS = (
+    "department",
+    "team",
+    "suggested_priority",
+    "suggested_assignee",
+    "classification_confidence",
+    "retrieved_docs"
+)
+
+# Rule-based first stage of the classify cascade. Each rule scores one point
+# per distinct keyword it matches; a ticket skips the LLM only when the best
+# rule has at least CASCADE_MIN_KEYWORDS of them and its confidence, which
+# grows with the lead over the runner-up rule, clears the floor. Ambiguous or
+# thinly matched tickets go to GPT-5 unchanged.
+CASCADE_CONFIDENCE_FLOOR = float(os.environ.get("TRIAGE_CASCADE_CONFIDENCE_FLOOR", "0.75"))
+CASCADE_MIN_KEYWORDS = 2
+
+# Keywords are whole words or phrases; generic terms ("sql", "db", "access")
+# are left out because they show up across slices, e.g. SQL injection reports
+# belong to Security rather than DBA
+_CASCADE_RULES = (
+    ("IT", "DBA", r"database|postgres(?:ql)?|mysql|deadlock|replication|stored procedure|query plan"),
+    ("IT", "DevOps", r"deploy(?:ment)?|pipeline|kubernetes|k8s|docker|ci/cd|terraform"),
+    ("IT", "Security", r"vpn|mfa|2fa|phishing|malware|firewall|password reset|sql injection|xss|vulnerability"),
+    ("HR", "Onboarding", r"onboard(?:ing)?|offboard(?:ing)?|new hire|background check"),
+    ("HR", "Payroll", r"payroll|payslip|paycheck|salary"),
+    ("Finance", "Accounting", r"invoice|expense|reimburse(?:ment)?|purchase order"),
+    ("Legal", "Contracts", r"contracts?|nda|gdpr|msa")
+)
+
+# All rules folded into one alternation, one named group per rule, so the
+# text is scanned once regardless of how many keywords the table holds
+_CASCADE_PATTERN = re.compile(
+    "|".join(rf"\b(?P<rule{index}>{keywords})\b" for index, (*_, keywords) in enumerate(_CASCADE_RULES)),
+    re.IGNORECASE
+)
+_CASCADE_GROUPS = {f"rule{index}": rule[:2] for index, rule in enumerate(_CASCADE_RULES)}
+
+# The cascade never lowers the reporter's priority; these keywords raise it
+_CASCADE_PRIORITY_RULES = (
+    ("Critical", re.compile(r"\b(?:outage|data loss|breach|production (?:is )?down)\b", re.IGNORECASE)),
+    ("High", re.compile(r"\b(?:urgent|asap|blocked|production)\b", re.IGNORECASE))
+)
+_PRIORITY_RANK = {"Low": 0, "Medium": 1, "High": 2, "Critical": 3}
+
+# Tickets arriving within the window share one classify call
+BATCH_WINDOW_MS = float(os.environ.get("TRIAGE_BATCH_WINDOW_MS", "50"))
+BATCH_MAX_SIZE = int(os.environ.get("TRIAGE_BATCH_MAX_SIZE", "16"))
+
+
+def _token_usage(messages: list) -> dict:
+    """
+    Sum token usage across LLM responses, including prompt-cache hits
+    """
+    usage = {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0}
+    for message in messages:
+        metadata = getattr(message, "usage_metadata", None)
+        if not metadata:
+            continue
+        usage["input_tokens"] += metadata.get("input_tokens", 0)
+        usage["output_tokens"] += metadata.get("output_tokens", 0)
+        usage["cache_read_input_tokens"] += (metadata.get("input_token_details") or {}).get("cache_read", 0)
+    return usage
+
 
 class TicketState(TypedDict):
     """State object passed through the LangGraph workflow"""
@@ -42,14 +138,254 @@ class TicketState(TypedDict):
     messages: Annotated[list, add_messages]
 
 
+def _cascade_classify(text: str) -> Optional[dict]:
+    """
+    Classify a ticket from keyword rules alone
+    
+    Returns:
+        Department, team and confidence of the best-scoring rule, or None
+        when it matches fewer than CASCADE_MIN_KEYWORDS distinct keywords
+    """
+    keywords = {}
+    for match in _CASCADE_PATTERN.finditer(text):
+        keywords.setdefault(match.lastgroup, set()).add(match.group().lower())
+    
+    scores = sorted((len(found) for found in keywords.values()), reverse=True)
+    if not scores or scores[0] < CASCADE_MIN_KEYWORDS:
+        return None
+    
+    best = max(keywords, key=lambda group: len(keywords[group]))
+    runner_up = scores[1] if len(scores) > 1 else 0
+    department, team = _CASCADE_GROUPS[best]
+    # Each keyword of lead halves the remaining doubt: 2 -> 0.75, 3 -> 0.875
+    confidence = 1.0 - 0.5 ** (scores[0] - runner_up)
+    return {"department": department, "team": team, "confidence": confidence}
+
+
+def _cascade_priority(text: str, priority: str) -> str:
+    """
+    Raise the reporter's priority when the text signals impact
+    """
+    for level, pattern in _CASCADE_PRIORITY_RULES:
+        if _PRIORITY_RANK[level] <= _PRIORITY_RANK.get(priority, 1):
+            break
+        if pattern.search(text):
+            return level
+    return priority
+
+
+class ClassificationModel(BaseModel):
+    """Structured output schema for ClassifyNode"""
+    department: Literal["IT", "HR", "Finance", "Legal", "General"]
+    team: Literal["DBA", "DevOps", "Security", "Onboarding", "Payroll", "Accounting", "Contracts", "Support"]
+    suggested_priority: Literal["Critical", "High", "Medium", "Low"]
+    suggested_assignee: str
+    confidence: float
+
+
+class BatchedClassification(ClassificationModel):
+    """Classification of one numbered ticket in a batched request"""
+    index: int
+
+
+class ClassificationBatch(BaseModel):
+    """Structured output schema for a batched classify request"""
+    classifications: list[BatchedClassification]
+
+
+async def _ainvoke_structured(runnable, messages: list) -> tuple[BaseModel, AIMessage]:
+    """
+    Invoke a with_structured_output(include_raw=True) runnable
+    
+    Returns:
+        Parsed model and the raw LLM response
+    """
+    output = await runnable.ainvoke(messages)
+    if output["parsed"] is None:
+        raise ValueError(f"Unparseable classification: {output['parsing_error']}")
+    return output["parsed"], output["raw"]
+
+
+def _batch_user_content(items: list[str]) -> str:
+    """
+    Concatenate several classify prompts into one numbered user message
+    """
+    tickets = "\n\n".join(f"[{index}]\n{content}" for index, content in enumerate(items, 1))
+    return f"""Tickets:
+{tickets}
+
+Classify each ticket independently and return one classification per ticket, with index set to the ticket number."""
+
+
+def _index_batch_classifications(batch: ClassificationBatch, count: int) -> dict[int, ClassificationModel]:
+    """
+    Map ticket number to classification from a batched classify response
+    """
+    return {
+        entry.index: entry
+        for entry in batch.classifications
+        if 1 <= entry.index <= count
+    }
+
+
+class ClassifyBatcher:
+    """
+    Micro-batcher that folds concurrent classify requests into one LLM call
+    
+    A background task drains the queue for up to BATCH_WINDOW_MS after the
+    first ticket arrives, so the system prompt and the HTTPS round-trip are
+    shared by every ticket in the window. Tickets the batched response does
+    not cover are retried with a single-ticket call.
+    """
+    
+    def __init__(self, llm, window_ms: float = BATCH_WINDOW_MS, max_size: int = BATCH_MAX_SIZE):
+        self.llm_classify = llm.with_structured_output(ClassificationModel, include_raw=True)
+        self.llm_classify_batch = llm.with_structured_output(ClassificationBatch, include_raw=True)
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue = None
+        self._task = None
+        self._loop = None
+        self._dispatches = set()
+        self._collecting = []
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        """
+        Whether the batching task is running on the current event loop
+        """
+        if self._stopping or self._task is None or self._task.done():
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+    
+    def start(self):
+        """
+        Start the batching task on the running event loop
+        """
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        self._task = self._loop.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Cancel the batching task and wait for in-flight batches
+        
+        New classify calls stop enqueueing as soon as this is called. Tickets
+        still queued or in a partly collected batch are classified one by
+        one, so their callers are not left waiting on futures nobody sets.
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        stranded, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            stranded.append(self._queue.get_nowait())
+        if stranded:
+            await asyncio.gather(*(self._resolve_one(content, future) for content, future in stranded))
+        
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+    
+    async def classify(self, user_content: str) -> tuple[ClassificationModel, AIMessage]:
+        """
+        Classify one ticket, batching with concurrent callers when running
+        
+        Returns:
+            Parsed classification and the LLM response it came from
+        """
+        if not self.running:
+            return await self._classify_one(user_content)
+        
+        future = self._loop.create_future()
+        await self._queue.put((user_content, future))
+        return await future
+    
+    async def _classify_one(self, user_content: str) -> tuple[ClassificationModel, AIMessage]:
+        messages = [
+            SystemMessage(content=CLASSIFY_SYSTEM_PROMPT),
+            HumanMessage(content=user_content)
+        ]
+        return await _ainvoke_structured(self.llm_classify, messages)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            self._collecting = []
+            task = loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, batch: list):
+        if len(batch) == 1:
+            await self._resolve_one(*batch[0])
+            return
+        
+        by_index = {}
+        response = None
+        try:
+            messages = [
+                SystemMessage(content=CLASSIFY_SYSTEM_PROMPT),
+                HumanMessage(content=_batch_user_content([content for content, _ in batch]))
+            ]
+            parsed, response = await _ainvoke_structured(self.llm_classify_batch, messages)
+            by_index = _index_batch_classifications(parsed, len(batch))
+        except Exception as e:
+            print(f"Warning: Batched classification failed, falling back to single calls: {e}")
+        
+        retries = []
+        for index, (content, future) in enumerate(batch, 1):
+            if index not in by_index:
+                retries.append(self._resolve_one(content, future))
+            elif not future.done():
+                # Usage for the whole batch is attributed to its first ticket
+                message = response if index == 1 else AIMessage(content=by_index[index].model_dump_json())
+                future.set_result((by_index[index], message))
+        if retries:
+            await asyncio.gather(*retries)
+    
+    async def _resolve_one(self, user_content: str, future: asyncio.Future):
+        try:
+            result = await self._classify_one(user_content)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+
 class JIRATriageAgent:
     """
     LangGraph-based multi-agent system for ticket triage with vertical slicing
     """
     
     def __init__(self):
-        azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT") or keyvault.get_secret("Azure-OpenAI-Endpoint")
-        azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY") or keyvault.get_secret("Azure-OpenAI-API-Key")
+        azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT") or get_keyvault().get_secret("Azure-OpenAI-Endpoint")
+        azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY") or get_keyvault().get_secret("Azure-OpenAI-API-Key")
         azure_api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
         
         openai_api_key = os.environ.get("OPENAI_API_KEY")
@@ -60,36 +396,74 @@ class JIRATriageAgent:
                 azure_endpoint=azure_endpoint,
                 api_key=azure_api_key,
                 api_version=azure_api_version,
-                max_tokens=2048
-            )
-            
-            self.embeddings = AzureOpenAIEmbeddings(
-                azure_deployment="text-embedding-3-small",
-                azure_endpoint=azure_endpoint,
-                api_key=azure_api_key,
-                api_version=azure_api_version
+                max_tokens=2048,
+                http_client=get_llm_http_client(),
+                http_async_client=get_llm_async_http_client()
             )
+            self._use_azure = True
             print("Initialized Azure OpenAI (Enterprise)")
         elif openai_api_key:
-            from langchain_openai import ChatOpenAI, OpenAIEmbeddings
             self.llm = ChatOpenAI(
                 model="gpt-5",
                 api_key=openai_api_key,
-                max_completion_tokens=2048
-            )
-            self.embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
-                api_key=openai_api_key
+                max_completion_tokens=2048,
+                http_client=get_llm_http_client(),
+                http_async_client=get_llm_async_http_client()
             )
+            self._use_azure = False
             print("Warning: Using public OpenAI endpoint (development only)")
         else:
             raise ValueError("No OpenAI credentials configured. Set AZURE_OPENAI_ENDPOINT + AZURE_OPENAI_API_KEY or OPENAI_API_KEY")
         
-        self.graph = self._build_graph()
+        self._azure_endpoint = azure_endpoint
+        self._azure_api_key = azure_api_key
+        self._azure_api_version = azure_api_version
+        self._openai_api_key = openai_api_key
+        
+        self.batcher = ClassifyBatcher(self.llm)
+        self._log_tasks = set()
+        self.response_cache = SemanticCache()
+    
+    @cached_property
+    def embeddings(self) -> OpenAIEmbeddings:
+        """
+        Embeddings client, built on first use by the semantic cache
+        """
+        if self._use_azure:
+            return AzureOpenAIEmbeddings(
+                azure_deployment="text-embedding-3-small",
+                azure_endpoint=self._azure_endpoint,
+                api_key=self._azure_api_key,
+                api_version=self._azure_api_version,
+                http_client=get_llm_http_client(),
+                http_async_client=get_llm_async_http_client()
+            )
+        return OpenAIEmbeddings(
+            model="text-embedding-3-small",
+            api_key=self._openai_api_key,
+            http_client=get_llm_http_client(),
+            http_async_client=get_llm_async_http_client()
+        )
+    
+    @cached_property
+    def embedding_cache(self) -> EmbeddingCache:
+        return EmbeddingCache(self.embeddings)
+    
+    @cached_property
+    def graph(self):
+        """
+        Compiled workflow, built once per agent on first use
+        """
+        return self._build_graph()
     
     def _build_graph(self) -> StateGraph:
         """
         Build the LangGraph workflow with conditional routing
+        
+        PolicyNode only reads the classification, reporter and redaction
+        flags, so it branches off ClassifyNode and runs alongside the
+        retrieve -> generate chain; LangGraph merges both branches' updates
+        before END.
         """
         workflow = StateGraph(TicketState)
         
@@ -101,40 +475,30 @@ class JIRATriageAgent:
         workflow.set_entry_point("classify")
         
         workflow.add_edge("classify", "retrieve")
+        workflow.add_edge("classify", "policy")
         workflow.add_edge("retrieve", "generate")
-        workflow.add_edge("generate", "policy")
+        workflow.add_edge("generate", END)
         workflow.add_edge("policy", END)
         
         return workflow.compile()
     
-    def classify_node(self, state: TicketState) -> dict:
+    async def classify_node(self, state: TicketState) -> dict:
         """
         ClassifyNode: Department/team/priority prediction with confidence scores
-        Uses GPT-5 for multi-class classification with structured output
+        Uses GPT-5 for multi-class classification with structured output;
+        tickets the keyword cascade classifies confidently skip the LLM call
         """
-        system_prompt = """You are an expert JIRA ticket classifier for enterprise IT operations.
-        
-Classify the ticket into:
-- department: IT, HR, Finance, Legal, General
-- team: DBA, DevOps, Security, Onboarding, Payroll, Contracts, Support
-- suggested_priority: Critical, High, Medium, Low
-- suggested_assignee: team lead email
-- confidence: 0.0 to 1.0
-
-Consider:
-- Technical keywords for IT (database, server, deployment, auth)
-- HR keywords (onboard, hire, termination, benefits)
-- Finance keywords (invoice, payment, expense, budget)
-- Legal keywords (contract, compliance, GDPR, NDA)
-
-Respond ONLY with valid JSON matching this schema:
-{
-  "department": "string",
-  "team": "string", 
-  "suggested_priority": "string",
-  "suggested_assignee": "string",
-  "confidence": number
-}"""
+        text = f"{state['summary']} {state['description']}"
+        cascade = _cascade_classify(text)
+        if cascade is not None and cascade["confidence"] >= CASCADE_CONFIDENCE_FLOOR:
+            return {
+                "department": cascade["department"],
+                "team": cascade["team"],
+                "suggested_priority": _cascade_priority(text, state['priority']),
+                "suggested_assignee": policy_engine.get_escalation_path(cascade["department"], cascade["team"])[0],
+                "classification_confidence": cascade["confidence"],
+                "messages": [AIMessage(content=json.dumps(cascade))]
+            }
         
         user_content = f"""Ticket Summary: {state['summary']}
 Ticket Description: {state['description']}
@@ -142,25 +506,15 @@ Original Priority: {state['priority']}
 Issue Type: {state['issue_type']}
 Redaction Flags: {', '.join(state['redaction_flags']) if state['redaction_flags'] else 'None'}"""
         
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_content)
-        ]
-        
         try:
-            response = self.llm.invoke(
-                messages,
-                response_format={"type": "json_object"}
-            )
-            
-            classification = json.loads(response.content)
+            classification, response = await self.batcher.classify(user_content)
             
             return {
-                "department": classification.get("department", "General"),
-                "team": classification.get("team", "Support"),
-                "suggested_priority": classification.get("suggested_priority", state['priority']),
-                "suggested_assignee": classification.get("suggested_assignee", "support@company.com"),
-                "classification_confidence": classification.get("confidence", 0.5),
+                "department": classification.department,
+                "team": classification.team,
+                "suggested_priority": classification.suggested_priority,
+                "suggested_assignee": classification.suggested_assignee,
+                "classification_confidence": classification.confidence,
                 "messages": [response]
             }
         except Exception as e:
@@ -173,7 +527,7 @@ Redaction Flags: {', '.join(state['redaction_flags']) if state['redaction_flags'
                 "messages": [AIMessage(content=f"Classification error: {str(e)}")]
             }
     
-    def retrieve_node(self, state: TicketState) -> dict:
+    async def retrieve_node(self, state: TicketState) -> dict:
         """
         RetrieveNode: Hybrid search (vector + keyword) from Azure AI Search
         Vertical slice routing - different knowledge bases per department
@@ -186,7 +540,7 @@ Redaction Flags: {', '.join(state['redaction_flags']) if state['redaction_flags'
         query_text = f"{summary} {description}"
         
         try:
-            search_results = search_manager.hybrid_search(
+            search_results = await get_search_manager().ahybrid_search(
                 query=query_text,
                 department=department,
                 team=team,
@@ -215,7 +569,7 @@ Redaction Flags: {', '.join(state['redaction_flags']) if state['redaction_flags'
                 ]
             }
     
-    def generate_node(self, state: TicketState) -> dict:
+    async def generate_node(self, state: TicketState) -> dict:
         """
         GenerateNode: Context-aware response generation using retrieved docs
         """
@@ -223,17 +577,8 @@ Redaction Flags: {', '.join(state['redaction_flags']) if state['redaction_flags'
         team = state.get("team", "Support")
         citations = state.get("retrieved_docs", [])
         
-        system_prompt = f"""You are an AI assistant helping triage JIRA tickets for the {department} department, {team} team.
-
-Generate a professional comment for the ticket that:
-1. Acknowledges the issue
-2. References relevant knowledge base articles (cite by ID)
-3. Provides next steps or initial guidance
-4. Suggests appropriate assignment
-
-Keep responses concise (2-3 sentences). Be helpful but direct."""
-        
-        user_content = f"""Ticket: {state['summary']}
+        user_content = f"""Department: {department}, Team: {team}
+Ticket: {state['summary']}
 Description: {state['description']}
 Classification: {department} > {team} (confidence: {state.get('classification_confidence', 0.0):.2f})
 Priority: {state.get('suggested_priority', 'Medium')}
@@ -242,12 +587,12 @@ Knowledge Base: {', '.join(citations)}
 Generate a triage comment:"""
         
         messages = [
-            SystemMessage(content=system_prompt),
+            SystemMessage(content=GENERATE_SYSTEM_PROMPT),
             HumanMessage(content=user_content)
         ]
         
         try:
-            response = self.llm.invoke(messages)
+            response = await self.llm.ainvoke(messages)
             generated_text = response.content
             
             return {
@@ -260,7 +605,7 @@ Generate a triage comment:"""
                 "messages": [AIMessage(content=f"Generation error: {str(e)}")]
             }
     
-    def policy_node(self, state: TicketState) -> dict:
+    async def policy_node(self, state: TicketState) -> dict:
         """
         PolicyNode: Enhanced policy evaluation using policy engine
         """
@@ -293,61 +638,197 @@ Generate a triage comment:"""
                 "requires_human_review": True
             }
     
-    def process(self, ticket_data: dict) -> dict:
-        """
-        Process a ticket through the complete LangGraph workflow
-        """
-        initial_state = TicketState(
-            ticket_id=ticket_data.get("ticket_id", ""),
-            issue_key=ticket_data.get("issue_key", ""),
-            summary=ticket_data.get("summary", ""),
-            description=ticket_data.get("description", ""),
-            issue_type=ticket_data.get("issue_type", ""),
-            priority=ticket_data.get("priority", "Medium"),
-            reporter=ticket_data.get("reporter", ""),
-            redaction_flags=ticket_data.get("redaction_flags", []),
-            department="",
-            team="",
-            suggested_priority="",
-            suggested_assignee="",
-            classification_confidence=0.0,
-            retrieved_docs=[],
-            generated_comment="",
-            policy_flags=[],
-            requires_human_review=False,
-            messages=[]
-        )
-        
-        final_state = self.graph.invoke(initial_state)
-        
-        result = {
+    @staticmethod
+    def _initial_state(ticket_data: Any) -> dict:
+        # Only the ticket inputs; node outputs are merged in by LangGraph and
+        # read with .get() defaults, so they are not pre-filled here.
+        # Tickets may be passed as a dict or as a dataclass with these fields;
+        # dataclass fields are read directly since asdict deep-copies them
+        if dataclasses.is_dataclass(ticket_data):
+            get = partial(getattr, ticket_data)
+        else:
+            get = ticket_data.get
+        return {
+            "ticket_id": get("ticket_id", ""),
+            "issue_key": get("issue_key", ""),
+            "summary": get("summary", ""),
+            "description": get("description", ""),
+            "issue_type": get("issue_type", ""),
+            "priority": get("priority", "Medium"),
+            "reporter": get("reporter", ""),
+            "redaction_flags": list(get("redaction_flags", []))
+        }
+    
+    async def _lookup_cache(self, state: dict) -> tuple[Optional[list[float]], Optional[dict]]:
+        if not CACHE_ENABLED:
+            return None, None
+        try:
+            cache_vector = (await self.embedding_cache.aget_or_compute(
+                [f"{state['summary']} {state['description']}"]
+            ))[0]
+            return cache_vector, self.response_cache.lookup(cache_vector)
+        except Exception as e:
+            print(f"Warning: Semantic cache lookup failed: {e}")
+            return None, None
+    
+    def _store_cache(self, cache_vector: Optional[list[float]], final_state: dict):
+        # Fallback classifications (confidence 0.0) are not worth reusing
+        if cache_vector is not None and final_state.get("classification_confidence", 0.0) > 0:
+            self.response_cache.put(
+                cache_vector,
+                {key: final_state.get(key) for key in _CACHED_STATE_KEYS}
+            )
+    
+    @staticmethod
+    def _classification(state: dict) -> dict:
+        return {
+            "department": state.get("department"),
+            "team": state.get("team"),
+            "suggested_priority": state.get("suggested_priority"),
+            "suggested_assignee": state.get("suggested_assignee"),
+            "confidence": state.get("classification_confidence", 0.0)
+        }
+    
+    @staticmethod
+    def _policy_event(state: dict) -> dict:
+        return {
+            "event": "policy",
+            "policy_flags": state.get("policy_flags", []),
+            "requires_human_review": state.get("requires_human_review", False)
+        }
+    
+    def _build_result(self, final_state: dict, cached: bool) -> dict:
+        return {
             "ticket_id": final_state["ticket_id"],
             "issue_key": final_state["issue_key"],
-            "classification": {
-                "department": final_state.get("department"),
-                "team": final_state.get("team"),
-                "suggested_priority": final_state.get("suggested_priority"),
-                "suggested_assignee": final_state.get("suggested_assignee"),
-                "confidence": final_state.get("classification_confidence", 0.0)
-            },
+            "classification": self._classification(final_state),
             "generated_comment": final_state.get("generated_comment"),
             "citations": final_state.get("retrieved_docs", []),
             "policy_flags": final_state.get("policy_flags", []),
             "confidence": final_state.get("classification_confidence", 0.0),
-            "model_used": "gpt-5-langgraph",
-            "requires_human_review": final_state.get("requires_human_review", False)
+            "model_used": "gpt-5-langgraph-cached" if cached else "gpt-5-langgraph",
+            "requires_human_review": final_state.get("requires_human_review", False),
+            "token_usage": _token_usage(final_state.get("messages", []))
         }
+    
+    def _schedule_decision_log(self, result: dict):
+        # The audit write is off the response path; failures are reported
+        # from the task's done callback
+        task = asyncio.create_task(get_decision_logger().alog_decision(
+            ticket_id=result["ticket_id"],
+            issue_key=result["issue_key"],
+            decision_data=result
+        ))
+        self._log_tasks.add(task)
+        task.add_done_callback(self._on_decision_logged)
+    
+    async def process(self, ticket_data: Any) -> dict:
+        """
+        Process a ticket through the complete LangGraph workflow
         
-        try:
-            decision_logger.log_decision(
-                ticket_id=result["ticket_id"],
-                issue_key=result["issue_key"],
-                decision_data=result
+        LLM, search and Cosmos DB calls all use async clients, so concurrent
+        tickets overlap their network round-trips. The decision log write is
+        scheduled in the background rather than awaited.
+        """
+        initial_state = self._initial_state(ticket_data)
+        correlation_id.set(initial_state["ticket_id"])
+        get_observability().start_ticket(initial_state["ticket_id"], initial_state["issue_key"])
+        cache_vector, cached = await self._lookup_cache(initial_state)
+        
+        if cached is not None:
+            final_state = {**initial_state, **cached}
+            generated, policy = await asyncio.gather(
+                self.generate_node(final_state),
+                self.policy_node(final_state)
             )
-        except Exception as e:
-            print(f"Decision logging error: {e}")
+            final_state.update(generated)
+            final_state.update(policy)
+        else:
+            final_state = await self.graph.ainvoke(initial_state)
+            self._store_cache(cache_vector, final_state)
         
+        result = self._build_result(final_state, cached is not None)
+        self._schedule_decision_log(result)
         return result
+    
+    async def astream_process(self, ticket_data: Any) -> AsyncIterator[dict]:
+        """
+        Process a ticket, yielding events as the workflow progresses
+        
+        Yields:
+            {"event": "classification", ...} once ClassifyNode finishes
+            {"event": "token", "delta": ...} per generated comment chunk
+            {"event": "policy", ...} once PolicyNode finishes, which runs
+                in parallel with retrieval and generation
+            {"event": "result", "result": ...} last, with the same dict
+                process returns
+        """
+        initial_state = self._initial_state(ticket_data)
+        correlation_id.set(initial_state["ticket_id"])
+        get_observability().start_ticket(initial_state["ticket_id"], initial_state["issue_key"])
+        cache_vector, cached = await self._lookup_cache(initial_state)
+        
+        if cached is not None:
+            final_state = {**initial_state, **cached}
+            yield {"event": "classification", **self._classification(final_state)}
+            policy = asyncio.ensure_future(self.policy_node(final_state))
+            final_state.update(await self.generate_node(final_state))
+            yield {"event": "token", "delta": final_state["generated_comment"]}
+            final_state.update(await policy)
+            yield self._policy_event(final_state)
+        else:
+            final_state = dict(initial_state)
+            messages = []
+            async for mode, chunk in self.graph.astream(initial_state, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "generate" and message.content:
+                        yield {"event": "token", "delta": message.content}
+                    continue
+                
+                for node, update in chunk.items():
+                    update = dict(update or {})
+                    messages.extend(update.pop("messages", []))
+                    final_state.update(update)
+                    if node == "classify":
+                        yield {"event": "classification", **self._classification(final_state)}
+                    elif node == "policy":
+                        yield self._policy_event(final_state)
+            
+            final_state["messages"] = messages
+            self._store_cache(cache_vector, final_state)
+        
+        result = self._build_result(final_state, cached is not None)
+        self._schedule_decision_log(result)
+        yield {"event": "result", "result": result}
+    
+    def _on_decision_logged(self, task: asyncio.Task):
+        self._log_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Decision logging error: {task.exception()}")
+    
+    async def flush_decision_logs(self):
+        """
+        Wait for in-flight decision log writes, e.g. before shutdown
+        """
+        if self._log_tasks:
+            await asyncio.gather(*self._log_tasks, return_exceptions=True)
+
+
+@lru_cache(maxsize=1)
+def get_agent() -> JIRATriageAgent:
+    """
+    Get the process-wide triage agent, creating it on first use
+    
+    Each Uvicorn worker builds its own agent (and LLM/Azure clients) after
+    it starts, since those connections must not be shared across a fork.
+    """
+    return JIRATriageAgent()
 
 
-agent = JIRATriageAgent()
+def __getattr__(name: str) -> Any:
+    # Keeps `from langgraph_agent import agent` working without building the
+    # agent at import time
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
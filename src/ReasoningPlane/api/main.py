@@ -3,16 +3,42 @@ JIRA Triage Agent - Reasoning Plane
 FastAPI service with LangGraph multi-agent workflow for ticket triage
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+import json
 import time
 import os
 
-from langgraph_agent import agent
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-app = FastAPI(title="JIRA Triage Agent - Reasoning Plane", version="2.0.0")
+from async_transport import close_async_clients, close_llm_async_http_client
+from langgraph_agent import get_agent
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_agent().batcher.start()
+    yield
+    await get_agent().batcher.stop()
+    await get_agent().flush_decision_logs()
+    await close_async_clients()
+    # The agent's LLM clients hold the shared OpenAI pool; drop them with it
+    # so a later startup in this process builds fresh ones
+    await close_llm_async_http_client()
+    get_agent.cache_clear()
+
+app = FastAPI(
+    title="JIRA Triage Agent - Reasoning Plane",
+    version="2.0.0",
+    default_response_class=ORJSONResponse if orjson else JSONResponse,
+    lifespan=lifespan
+)
 
 class SanitizedTicket(BaseModel):
     ticket_id: str
@@ -53,7 +79,7 @@ async def root():
         "architecture": "Hybrid Polyglot - Python GenAI Layer with LangGraph",
         "ai_model": "gpt-5",
         "features": [
-            "Multi-agent workflow (Classify → Retrieve → Generate → Policy)",
+            "Multi-agent workflow (Classify → Retrieve → Generate, Policy in parallel)",
             "Vertical slice routing (IT, HR, Finance, Legal)",
             "Zero-trust data governance",
             "Human-in-the-loop policy enforcement"
@@ -78,58 +104,100 @@ async def health():
         "message": "OK" if agent_ready else "No OpenAI credentials configured (OPENAI_API_KEY or AZURE_OPENAI_ENDPOINT+API_KEY required)"
     }
 
+def _ticket_data(ticket: SanitizedTicket) -> dict:
+    return {
+        "ticket_id": ticket.ticket_id,
+        "issue_key": ticket.issue_key,
+        "summary": ticket.summary,
+        "description": ticket.description,
+        "issue_type": ticket.issue_type or "Unknown",
+        "priority": ticket.priority or "Medium",
+        "reporter": ticket.reporter or "unknown",
+        "redaction_flags": ticket.redaction_flags
+    }
+
+def _sse(event: dict) -> str:
+    data = orjson.dumps(event).decode() if orjson else json.dumps(event)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+def _enriched_result(result: dict, latency: int) -> EnrichedTicketResult:
+    classification_data = result.get("classification", {})
+    classification = Classification(
+        department=classification_data.get("department"),
+        team=classification_data.get("team"),
+        suggested_priority=classification_data.get("suggested_priority"),
+        suggested_assignee=classification_data.get("suggested_assignee"),
+        confidence=classification_data.get("confidence", 0.0)
+    )
+    
+    return EnrichedTicketResult(
+        ticket_id=result["ticket_id"],
+        issue_key=result["issue_key"],
+        classification=classification,
+        generated_comment=result.get("generated_comment", ""),
+        citations=result.get("citations", []),
+        policy_flags=result.get("policy_flags", []),
+        confidence=result.get("confidence", 0.0),
+        model_used=result.get("model_used", "gpt-5-langgraph"),
+        latency_ms=latency,
+        requires_human_review=result.get("requires_human_review", False)
+    )
+
 @app.post("/process_ticket", response_model=EnrichedTicketResult)
 async def process_ticket(ticket: SanitizedTicket) -> EnrichedTicketResult:
     """
     Process a sanitized ticket through the LangGraph multi-agent workflow.
     
-    Workflow: ClassifyNode → RetrieveNode → GenerateNode → PolicyNode
+    Workflow: ClassifyNode → (RetrieveNode → GenerateNode) ∥ PolicyNode
     """
     start_time = time.time()
     
     try:
-        ticket_data = {
-            "ticket_id": ticket.ticket_id,
-            "issue_key": ticket.issue_key,
-            "summary": ticket.summary,
-            "description": ticket.description,
-            "issue_type": ticket.issue_type or "Unknown",
-            "priority": ticket.priority or "Medium",
-            "reporter": ticket.reporter or "unknown",
-            "redaction_flags": ticket.redaction_flags
-        }
-        
-        result = agent.process(ticket_data)
+        result = await get_agent().process(_ticket_data(ticket))
         
         latency = int((time.time() - start_time) * 1000)
         
-        classification_data = result.get("classification", {})
-        classification = Classification(
-            department=classification_data.get("department"),
-            team=classification_data.get("team"),
-            suggested_priority=classification_data.get("suggested_priority"),
-            suggested_assignee=classification_data.get("suggested_assignee"),
-            confidence=classification_data.get("confidence", 0.0)
-        )
-        
-        return EnrichedTicketResult(
-            ticket_id=result["ticket_id"],
-            issue_key=result["issue_key"],
-            classification=classification,
-            generated_comment=result.get("generated_comment", ""),
-            citations=result.get("citations", []),
-            policy_flags=result.get("policy_flags", []),
-            confidence=result.get("confidence", 0.0),
-            model_used=result.get("model_used", "gpt-5-langgraph"),
-            latency_ms=latency,
-            requires_human_review=result.get("requires_human_review", False)
-        )
+        return _enriched_result(result, latency)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Agent processing failed: {str(e)}"
         )
 
+@app.post("/process_ticket_stream")
+async def process_ticket_stream(ticket: SanitizedTicket) -> StreamingResponse:
+    """
+    Process a sanitized ticket, streaming progress as Server-Sent Events.
+    
+    Events: classification, then token (one per comment chunk) and policy
+    as each becomes available, then result with the same payload as
+    /process_ticket. A failure is reported as an error event and ends the
+    stream.
+    """
+    start_time = time.time()
+    ticket_data = _ticket_data(ticket)
+    
+    async def event_stream():
+        try:
+            async for event in get_agent().astream_process(ticket_data):
+                if event["event"] == "result":
+                    latency = int((time.time() - start_time) * 1000)
+                    event = {"event": "result", **_enriched_result(event["result"], latency).model_dump(mode="json")}
+                yield _sse(event)
+        except Exception as e:
+            yield _sse({"event": "error", "detail": f"Agent processing failed: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8001,
+        # "auto" uses uvloop and httptools when installed (uvicorn[standard])
+        # and falls back to asyncio and h11 otherwise
+        loop="auto",
+        http="auto",
+        workers=int(os.environ.get("UVICORN_WORKERS", "4"))
+    )
@@ -3,14 +3,162 @@ Application Insights Integration
 Distributed tracing, metrics collection, and structured logging
 """
 
+import atexit
+import contextlib
 import os
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime
+import random
+import warnings
+import zlib
+from contextvars import ContextVar
+from functools import cached_property, lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from typing import Optional, Dict, Any, Union
+from correlation import CorrelationIdFilter
 from opencensus.ext.azure.log_exporter import AzureLogHandler
 from opencensus.ext.azure.trace_exporter import AzureExporter
 from opencensus.trace.tracer import Tracer
-from opencensus.trace.samplers import ProbabilitySampler
+from opencensus.trace.tracers.noop_tracer import NoopTracer
+from opencensus.trace.samplers import AlwaysOnSampler
+
+
+# Log calls only enqueue; a listener thread feeds the exporters, which send
+# batches of up to TELEMETRY_MAX_BATCH_SIZE every export interval
+LOG_QUEUE_SIZE = 10_000
+TELEMETRY_EXPORT_INTERVAL_SECONDS = 5.0
+TELEMETRY_MAX_BATCH_SIZE = 100
+
+# Error events carry the last MAX_TRACE_CHARS of the stack trace, and only
+# for ERROR_TRACE_SAMPLE_RATE of errors, so an error storm stays cheap to
+# serialize and under the ingestion throttle
+MAX_TRACE_CHARS = 1024
+ERROR_TRACE_SAMPLE_RATE = float(os.environ.get("TRIAGE_ERROR_TRACE_SAMPLE_RATE", "0.1"))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Formatters hold no per-record state, so every handler shares this one
+_LOG_FORMATTER = logging.Formatter(LOG_FORMAT)
+
+# Share of tickets traced (0 disables tracing). Tickets are picked by a hash
+# of their ID, so every span of a ticket is kept or dropped together
+TRACE_SAMPLING_RATE = float(os.environ.get("APPLICATIONINSIGHTS_SAMPLING_RATE", "0.1"))
+_TRACE_SAMPLE_THRESHOLD = int(TRACE_SAMPLING_RATE * (1 << 32))
+
+# Returned instead of a span when tracing is off, so callers can always
+# use `with observability.trace_ticket_processing(...):`
+_NULL_SPAN = contextlib.nullcontext()
+
+_SPAN_NAMES = {
+    operation: f"{operation}_ticket"
+    for operation in ("classify", "retrieve", "generate", "policy")
+}
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking"""
+    
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self.dropped = 0
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class _ServiceLogger(logging.Logger):
+    """
+    Logger whose records skip the caller lookup
+    
+    Every record comes from an ObservabilityManager method, so the caller's
+    file and line carry no information; reporting a fixed location avoids
+    walking the stack per record. Scoped to this logger rather than set
+    through the logging module globals, which would apply process-wide.
+    """
+    
+    def findCaller(self, stack_info: bool = False, stacklevel: int = 1):
+        return "(unknown file)", 0, "(unknown function)", None
+
+
+# Dimensions shared by every event of the ticket being processed in the
+# current context; set once per ticket by ObservabilityManager.start_ticket
+_ticket_dimensions: ContextVar[Dict[str, Any]] = ContextVar("ticket_dimensions", default={})
+
+
+def _ticket_sampled(ticket_id: str) -> bool:
+    return zlib.crc32(ticket_id.encode("utf-8")) < _TRACE_SAMPLE_THRESHOLD
+
+
+def _join_list_dimensions(record: logging.LogRecord) -> bool:
+    """
+    Handler filter that flattens list dimensions to comma-separated strings
+    
+    Application Insights expects string property values. Running this on the
+    exporting handler keeps the join on the listener thread, and only for
+    records that are actually exported.
+    """
+    dimensions = getattr(record, "custom_dimensions", None)
+    if dimensions:
+        for key, value in dimensions.items():
+            if isinstance(value, list):
+                dimensions[key] = ",".join(map(str, value))
+    return True
+
+
+# Builders for the `extra` payload of each event type. Messages use %-style
+# arguments so the text is only formatted for records that are emitted.
+def _classification_extra(ticket_id: str, department: str, team: str, confidence: float, latency_ms: int) -> dict:
+    return {"custom_dimensions": {
+        **_ticket_dimensions.get(),
+        "ticket_id": ticket_id,
+        "department": department,
+        "team": team,
+        "confidence": confidence,
+        "latency_ms": latency_ms,
+        "event_type": "classification"
+    }}
+
+
+def _policy_extra(ticket_id: str, requires_review: bool, policy_flags: list, sla_hours: float) -> dict:
+    return {"custom_dimensions": {
+        **_ticket_dimensions.get(),
+        "ticket_id": ticket_id,
+        "requires_review": requires_review,
+        "policy_flags": policy_flags,
+        "sla_hours": sla_hours,
+        "event_type": "policy_decision"
+    }}
+
+
+def _error_extra(ticket_id: str, error_message: str, error_type: str, stack_trace: Optional[str]) -> dict:
+    return {"custom_dimensions": {
+        **_ticket_dimensions.get(),
+        "ticket_id": ticket_id,
+        "error_type": error_type,
+        "error_message": error_message,
+        "stack_trace": stack_trace,
+        "event_type": "error"
+    }}
+
+
+def _metric_extra(metric_name: str, value: float, properties: Optional[Dict[str, Any]]) -> dict:
+    dimensions = {**_ticket_dimensions.get(), "metric_name": metric_name, "metric_value": value, "event_type": "metric"}
+    if properties:
+        dimensions.update(properties)
+    return {"custom_dimensions": dimensions}
+
+
+def _request_extra(method: str, url: str, status_code: int, duration_ms: int) -> dict:
+    return {"custom_dimensions": {
+        **_ticket_dimensions.get(),
+        "method": method,
+        "url": url,
+        "status_code": status_code,
+        "duration_ms": duration_ms,
+        "event_type": "request"
+    }}
 
 
 class ObservabilityManager:
@@ -22,6 +170,7 @@ class ObservabilityManager:
     - Custom metrics tracking (latency, confidence, etc.)
     - Structured logging with correlation IDs
     - Performance monitoring
+    - Log handlers and tracer created lazily on first use
     """
     
     def __init__(
@@ -35,56 +184,115 @@ class ObservabilityManager:
         self.service_name = service_name
         
         if not self.connection_string:
-            print("Warning: Application Insights not configured. Logging to console only.")
+            warnings.warn(
+                "Application Insights not configured; logging to console only.",
+                RuntimeWarning,
+                stacklevel=2
+            )
             self.configured = False
-            self._setup_console_logging()
             return
         
         self.configured = True
-        self._setup_logging()
-        self._setup_tracing()
     
-    def _setup_console_logging(self):
+    @cached_property
+    def logger(self) -> logging.Logger:
+        if not self.configured:
+            return self._setup_console_logging()
+        return self._setup_logging()
+    
+    @cached_property
+    def tracer(self) -> Union[Tracer, NoopTracer]:
+        return self._setup_tracing()
+    
+    def _setup_console_logging(self) -> logging.Logger:
         """Setup basic console logging when App Insights is not configured"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        self.logger = logging.getLogger(self.service_name)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_LOG_FORMATTER)
+        return self._setup_queued_logger(console_handler)
     
-    def _setup_logging(self):
+    def _setup_logging(self) -> logging.Logger:
         """Configure Application Insights logging"""
-        logger = logging.getLogger(self.service_name)
+        handler = AzureLogHandler(
+            connection_string=self.connection_string,
+            export_interval=TELEMETRY_EXPORT_INTERVAL_SECONDS,
+            max_batch_size=TELEMETRY_MAX_BATCH_SIZE
+        )
+        handler.setFormatter(_LOG_FORMATTER)
+        handler.addFilter(_join_list_dimensions)
+        
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_LOG_FORMATTER)
+        
+        return self._setup_queued_logger(handler, console_handler)
+    
+    def _setup_queued_logger(self, *handlers: logging.Handler) -> logging.Logger:
+        """
+        Attach handlers to the service logger behind a bounded queue
+        
+        The logger's only handler enqueues onto the queue and the logger does
+        not propagate to root, so a log call never formats, writes or exports
+        on the request thread. A QueueListener thread hands records to the
+        handlers. When they fall behind, records are dropped rather than
+        blocking request handling or growing memory without bound.
+        """
+        # Built directly rather than through getLogger, which would return
+        # a plain Logger; propagate is off, so it needs no parent
+        logger = _ServiceLogger(self.service_name)
         logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addFilter(CorrelationIdFilter())
         
-        handler = AzureLogHandler(connection_string=self.connection_string)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        ))
-        logger.addHandler(handler)
+        log_queue = Queue(maxsize=LOG_QUEUE_SIZE)
+        self._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self._listener.stop)
         
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        ))
-        logger.addHandler(console_handler)
+        logger.addHandler(_DroppingQueueHandler(log_queue))
         
-        self.logger = logger
+        return logger
     
-    def _setup_tracing(self):
-        """Configure distributed tracing"""
-        if not self.configured:
-            self.tracer = None
-            return
+    def _setup_tracing(self) -> Union[Tracer, NoopTracer]:
+        """
+        Configure distributed tracing
         
-        exporter = AzureExporter(connection_string=self.connection_string)
-        sampler = ProbabilitySampler(rate=1.0)
+        The tracer records every span it is given; sampling is done per
+        ticket in trace_ticket_processing. Error and event logs go through
+        the log exporter and are not sampled. When tracing is off this is a
+        NoopTracer, which registers nothing in the opencensus execution
+        context and creates no exporter.
+        """
+        if not self.configured or TRACE_SAMPLING_RATE <= 0:
+            return NoopTracer()
+        
+        exporter = AzureExporter(
+            connection_string=self.connection_string,
+            export_interval=TELEMETRY_EXPORT_INTERVAL_SECONDS,
+            max_batch_size=TELEMETRY_MAX_BATCH_SIZE
+        )
         
-        self.tracer = Tracer(
+        return Tracer(
             exporter=exporter,
-            sampler=sampler
+            sampler=AlwaysOnSampler()
         )
     
+    def start_ticket(self, ticket_id: str, issue_key: str) -> Dict[str, Any]:
+        """
+        Set the dimensions attached to every event logged for this ticket
+        
+        The values are held in a context variable, so they follow the
+        current request's task and do not leak into concurrent requests.
+        
+        Args:
+            ticket_id: Unique ticket identifier
+            issue_key: JIRA issue key
+        
+        Returns:
+            The shared per-ticket dimensions
+        """
+        dimensions = {"ticket_id": ticket_id, "issue_key": issue_key}
+        _ticket_dimensions.set(dimensions)
+        return dimensions
+    
     def trace_ticket_processing(
         self,
         ticket_id: str,
@@ -98,14 +306,21 @@ class ObservabilityManager:
             ticket_id: Unique ticket identifier
             issue_key: JIRA issue key
             operation: Operation name (classify, retrieve, generate, policy)
+        
+        Returns:
+            The span, or a no-op context manager when tracing is off or the
+            ticket is not sampled
         """
-        if not self.tracer:
-            return None
+        # Also covers a sampling rate of 0, where no ticket is sampled
+        if not self.configured or not _ticket_sampled(ticket_id):
+            return _NULL_SPAN
         
-        span = self.tracer.span(name=f"{operation}_ticket")
-        span.add_attribute("ticket_id", ticket_id)
-        span.add_attribute("issue_key", issue_key)
-        span.add_attribute("operation", operation)
+        span = self.tracer.span(name=_SPAN_NAMES.get(operation) or f"{operation}_ticket")
+        span.attributes.update({
+            "ticket_id": ticket_id,
+            "issue_key": issue_key,
+            "operation": operation
+        })
         return span
     
     def log_classification(
@@ -117,18 +332,13 @@ class ObservabilityManager:
         latency_ms: int
     ):
         """Log classification event with metrics"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         self.logger.info(
-            f"Classification complete: {ticket_id}",
-            extra={
-                "custom_dimensions": {
-                    "ticket_id": ticket_id,
-                    "department": department,
-                    "team": team,
-                    "confidence": confidence,
-                    "latency_ms": latency_ms,
-                    "event_type": "classification"
-                }
-            }
+            "Classification complete: %s",
+            ticket_id,
+            extra=_classification_extra(ticket_id, department, team, confidence, latency_ms)
         )
     
     def log_policy_decision(
@@ -139,17 +349,13 @@ class ObservabilityManager:
         sla_hours: float
     ):
         """Log policy evaluation result"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         self.logger.info(
-            f"Policy evaluation: {ticket_id}",
-            extra={
-                "custom_dimensions": {
-                    "ticket_id": ticket_id,
-                    "requires_review": requires_review,
-                    "policy_flags": ",".join(policy_flags),
-                    "sla_hours": sla_hours,
-                    "event_type": "policy_decision"
-                }
-            }
+            "Policy evaluation: %s",
+            ticket_id,
+            extra=_policy_extra(ticket_id, requires_review, policy_flags, sla_hours)
         )
     
     def log_error(
@@ -159,18 +365,20 @@ class ObservabilityManager:
         error_type: str,
         stack_trace: Optional[str] = None
     ):
-        """Log error with full context"""
+        """Log error with context and a sampled, truncated stack trace"""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        
+        if stack_trace:
+            if random.random() >= ERROR_TRACE_SAMPLE_RATE:
+                stack_trace = None
+            elif len(stack_trace) > MAX_TRACE_CHARS:
+                stack_trace = "..." + stack_trace[-MAX_TRACE_CHARS:]
+        
         self.logger.error(
-            f"Error processing ticket: {ticket_id}",
-            extra={
-                "custom_dimensions": {
-                    "ticket_id": ticket_id,
-                    "error_type": error_type,
-                    "error_message": error_message,
-                    "stack_trace": stack_trace,
-                    "event_type": "error"
-                }
-            }
+            "Error processing ticket: %s",
+            ticket_id,
+            extra=_error_extra(ticket_id, error_message, error_type, stack_trace)
         )
     
     def track_metric(
@@ -188,16 +396,14 @@ class ObservabilityManager:
         - human_review_rate
         - sla_compliance_rate
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         self.logger.info(
-            f"Metric: {metric_name} = {value}",
-            extra={
-                "custom_dimensions": {
-                    "metric_name": metric_name,
-                    "metric_value": value,
-                    "event_type": "metric",
-                    **(properties or {})
-                }
-            }
+            "Metric: %s = %s",
+            metric_name,
+            value,
+            extra=_metric_extra(metric_name, value, properties)
         )
     
     def log_request(
@@ -208,18 +414,28 @@ class ObservabilityManager:
         duration_ms: int
     ):
         """Log HTTP request"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         self.logger.info(
-            f"Request: {method} {url}",
-            extra={
-                "custom_dimensions": {
-                    "method": method,
-                    "url": url,
-                    "status_code": status_code,
-                    "duration_ms": duration_ms,
-                    "event_type": "request"
-                }
-            }
+            "Request: %s %s",
+            method,
+            url,
+            extra=_request_extra(method, url, status_code, duration_ms)
         )
 
 
-observability = ObservabilityManager()
+@lru_cache(maxsize=1)
+def get_observability() -> ObservabilityManager:
+    """
+    Return the process-wide observability manager, creating it on first use
+    """
+    return ObservabilityManager()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from observability import observability` working without
+    # creating the manager at import time
+    if name == "observability":
+        return get_observability()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
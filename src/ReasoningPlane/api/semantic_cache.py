@@ -0,0 +1,99 @@
+"""
+Semantic Response Cache
+Reuses triage results for near-duplicate tickets by embedding similarity
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+CACHE_ENABLED = os.environ.get("TRIAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_THRESHOLD = float(os.environ.get("TRIAGE_CACHE_THRESHOLD", "0.92"))
+CACHE_TTL_SECONDS = float(os.environ.get("TRIAGE_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = 4096
+
+
+class SemanticCache:
+    """
+    In-process nearest-neighbour cache keyed on text embeddings
+    
+    Entries live in a fixed-size ring of unit vectors, so a lookup is one
+    matrix-vector product over at most CACHE_MAX_ENTRIES rows. The oldest
+    entry is overwritten once the ring is full; expired entries never match.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = CACHE_THRESHOLD,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.zeros(max_entries)
+        self._values: list = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, vector: Sequence[float]) -> Optional[dict]:
+        """
+        Return a copy of the closest cached value above the threshold
+        
+        Args:
+            vector: Embedding of the incoming ticket
+        
+        Returns:
+            Cached value, or None on a miss
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._size or self._vectors.shape[1] != query.shape[0]:
+                return None
+            
+            similarities = self._vectors[:self._size] @ query
+            similarities[self._expires[:self._size] < time.monotonic()] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return dict(self._values[best])
+    
+    def put(self, vector: Sequence[float], value: dict):
+        """
+        Store a value under an embedding, evicting the oldest entry when full
+        """
+        row = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != row.shape[0]:
+                self._vectors = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+                self._size = 0
+                self._next = 0
+            
+            slot = self._next
+            self._vectors[slot] = row
+            self._expires[slot] = time.monotonic() + self.ttl_seconds
+            self._values[slot] = dict(value)
+            self._next = (slot + 1) % self.max_entries
+            self._size = max(self._size, slot + 1)
+    
+    def clear(self):
+        """
+        Drop every cached entry
+        """
+        with self._lock:
+            self._vectors = None
+            self._values = [None] * self.max_entries
+            self._size = 0
+            self._next = 0